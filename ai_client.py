@@ -0,0 +1,25 @@
+"""
+🤖 Shared OpenAI Client
+AsyncOpenAI auf dem aiohttp-Transport statt des Default-httpx-Transports
+"""
+
+from typing import Optional
+
+from openai import AsyncOpenAI, DefaultAioHttpClient
+
+# 🚀 PROCESS-WIDE CLIENT (ein Connection Pool für Vision + Text)
+_client: Optional[AsyncOpenAI] = None
+
+def get_openai_client() -> AsyncOpenAI:
+    """Lazy erstellter OpenAI Client (API Key aus OPENAI_API_KEY)"""
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(http_client=DefaultAioHttpClient())
+    return _client
+
+async def close_openai_client() -> None:
+    """Client beim Shutdown schließen"""
+    global _client
+    if _client is not None:
+        await _client.close()
+    _client = None
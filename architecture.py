@@ -5,18 +5,27 @@ Optimiert für minimale Latenz und maximale Skalierbarkeit
 
 from dataclasses import dataclass
 from typing import Optional, List, Dict, Any
-from enum import Enum
+from enum import StrEnum
 import asyncio
+import aiohttp
+import numpy as np
 from pydantic import BaseModel
 
-class ProductCategory(Enum):
+from openai import AsyncOpenAI
+
+from ai_client import get_openai_client
+from http_client import get_session
+from market_stats import OFFLOAD_THRESHOLD, price_stats
+from redis_cache import redis_cached
+
+class ProductCategory(StrEnum):
     ELECTRONICS = "electronics"
     INSTRUMENTS = "instruments" 
     FASHION = "fashion"
     HOME = "home"
     AUTOMOTIVE = "automotive"
 
-class ListingStatus(Enum):
+class ListingStatus(StrEnum):
     ANALYZING = "analyzing"
     RESEARCHING = "researching"
     GENERATING = "generating"
@@ -24,7 +33,7 @@ class ListingStatus(Enum):
     PUBLISHED = "published"
     ERROR = "error"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ProductAnalysis:
     """Ergebnis der KI-Bildanalyse - kompakt und effizient"""
     brand: str
@@ -33,8 +42,13 @@ class ProductAnalysis:
     condition: str
     key_features: List[str]
     confidence_score: float
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProductAnalysis":
+        """Rekonstruktion aus dem Redis Cache (Enum kommt als String zurück)"""
+        return cls(**{**data, "category": ProductCategory(data["category"])})
 
-@dataclass 
+@dataclass(slots=True, frozen=True)
 class MarketData:
     """Marktanalyse-Daten für optimale Preisfindung"""
     average_price: float
@@ -42,8 +56,26 @@ class MarketData:
     competitor_count: int
     trending_keywords: List[str]
     optimal_timing: str
+    
+    @classmethod
+    def from_research_results(cls, results: List[Any]) -> "MarketData":
+        """Aggregiert (Preise, Konkurrenzanalyse, Keywords) aus research_market"""
+        prices, competitors, keywords = results
+        prices = prices or {}
+        competitors = competitors or {}
+        
+        price_array = np.asarray(list(prices.values()), dtype=np.float64)
+        mean, _median, p25, p75 = price_stats(price_array)
+        
+        return cls(
+            average_price=float(mean),
+            price_range=(float(p25), float(p75)),
+            competitor_count=int(competitors.get("competitor_count", len(prices))),
+            trending_keywords=list(keywords or []),
+            optimal_timing=competitors.get("optimal_timing", "")
+        )
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ListingContent:
     """Generierter Content für eBay-Auktion"""
     title: str  # SEO-optimiert, max 80 Zeichen
@@ -52,22 +84,36 @@ class ListingContent:
     buy_it_now_price: Optional[float]
     keywords: List[str]
     category_id: int
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ListingContent":
+        """Rekonstruktion aus dem Redis Cache"""
+        return cls(**data)
 
 class EbayAutomationEngine:
     """
     🎯 Hauptengine - Async-First für maximale Performance
     """
     
-    def __init__(self):
-        self.image_analyzer = ImageAnalyzer()
-        self.market_researcher = MarketResearcher() 
-        self.content_generator = ContentGenerator()
-        self.ebay_client = EbayAPIClient()
+    def __init__(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        openai_client: Optional[AsyncOpenAI] = None
+    ):
+        # Alle Komponenten teilen sich einen Connection Pool
+        self.image_analyzer = ImageAnalyzer(session, openai_client)
+        self.market_researcher = MarketResearcher(session)
+        self.content_generator = ContentGenerator(openai_client)
+        self.ebay_client = EbayAPIClient(session)
     
     async def process_product_image(self, image_url: str) -> ProductAnalysis:
         """Blitzschnelle Bildanalyse mit Vision AI"""
         return await self.image_analyzer.analyze_async(image_url)
     
+    async def process_product_image_data(self, image_data: bytes) -> ProductAnalysis:
+        """Bildanalyse direkt auf bereits komprimierten Upload-Bytes"""
+        return await self.image_analyzer.analyze_image_bytes(image_data)
+    
     async def research_market(self, product: ProductAnalysis) -> MarketData:
         """Parallele Marktforschung für optimale Preise"""
         tasks = [
@@ -76,54 +122,209 @@ class EbayAutomationEngine:
             self.market_researcher.get_trending_keywords(product)
         ]
         results = await asyncio.gather(*tasks)
+        # Große Preislisten: Numba-Kernel (nogil) im Thread, damit der Event Loop frei bleibt
+        if len(results[0] or ()) >= OFFLOAD_THRESHOLD:
+            return await asyncio.to_thread(MarketData.from_research_results, results)
         return MarketData.from_research_results(results)
     
     async def generate_listing(self, product: ProductAnalysis, market: MarketData) -> ListingContent:
         """KI-generierte, verkaufsoptimierte Inhalte"""
         return await self.content_generator.create_listing_async(product, market)
     
+    async def generate_listings(
+        self,
+        items: List[tuple[ProductAnalysis, MarketData]]
+    ) -> List[ListingContent | BaseException]:
+        """Katalog-Import: viele Listings parallel (begrenzt), Fehler pro Item"""
+        return await self.content_generator.create_listings_async(items)
+    
     async def publish_to_ebay(self, listing: ListingContent, images: List[str]) -> str:
         """One-Shot Veröffentlichung auf eBay"""
         return await self.ebay_client.create_listing_async(listing, images)
 
-class ImageAnalyzer:
+class PooledHTTPComponent:
+    """Basis für Komponenten mit ausgehenden HTTP-Calls über den geteilten Pool"""
+    
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        self._session = session
+    
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Lazy: Die globale Session wird erst im laufenden Event Loop erstellt
+        return self._session or get_session()
+
+class OpenAIComponent:
+    """Basis für Komponenten, die GPT-4V / GPT-4 aufrufen"""
+    
+    def __init__(self, openai_client: Optional[AsyncOpenAI] = None):
+        self._openai = openai_client
+    
+    @property
+    def openai(self) -> AsyncOpenAI:
+        return self._openai or get_openai_client()
+
+class ImageAnalyzer(PooledHTTPComponent, OpenAIComponent):
     """🔍 Ultraschnelle Produkterkennung"""
     
+    def __init__(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        openai_client: Optional[AsyncOpenAI] = None
+    ):
+        PooledHTTPComponent.__init__(self, session)
+        OpenAIComponent.__init__(self, openai_client)
+    
     async def analyze_async(self, image_url: str) -> ProductAnalysis:
+        # Cache über den Bildinhalt, nicht die URL → CDN-Varianten teilen sich einen Eintrag
+        async with self.session.get(image_url) as resp:
+            resp.raise_for_status()
+            image_data = await resp.read()
+        return await self.analyze_image_bytes(image_data)
+    
+    # Cache erst mit echtem Body aktivieren (None wird nie gecacht):
+    # @redis_cached(ttl=86400, prefix="vision", decode=ProductAnalysis.from_dict,
+    #               key_builder=lambda image_data: hashlib.sha256(image_data).hexdigest())
+    async def analyze_image_bytes(self, image_data: bytes) -> ProductAnalysis:
         # TODO: Integration mit GPT-4V oder Claude Vision
+        # Bytes als base64 Data-URL senden (f"data:image/jpeg;base64,{b64encode(image_data)}")
         # Optimiert für <2s Response Time
         pass
 
-class MarketResearcher:
+class MarketResearcher(PooledHTTPComponent):
     """📊 Intelligente Marktanalyse"""
     
+    @redis_cached(ttl=3600, prefix="ebay_prices")
     async def get_ebay_prices(self, product: ProductAnalysis) -> Dict[str, float]:
-        # TODO: eBay Finding API + Caching in Redis
+        # TODO: eBay Finding API
         pass
     
+    @redis_cached(ttl=3600, prefix="ebay_competitors")
     async def get_competitor_analysis(self, product: ProductAnalysis) -> Dict[str, Any]:
         # TODO: Konkurrenz-Listings analysieren
         pass
+    
+    async def get_trending_keywords(self, product: ProductAnalysis) -> List[str]:
+        # TODO: eBay Merchandising API (Suchtrends) - bis dahin Keywords aus der Bildanalyse
+        candidates = [product.brand, product.model, *product.key_features]
+        return list(dict.fromkeys(k for k in candidates if k))
 
-class ContentGenerator:
+class ContentGenerator(OpenAIComponent):
     """📝 KI-Content-Pipeline"""
     
+    # Max. gleichzeitige GPT-Calls pro Batch (alle teilen sich den AsyncOpenAI Pool)
+    MAX_CONCURRENCY = 20
+    
+    # Prompt ist deterministisch aus (Produkt, Markt) → Key = BLAKE2b der Eingaben.
+    # 7 Tage TTL, da Startpreise aus den Marktdaten veralten. Erst mit echtem Body aktivieren:
+    # @redis_cached(ttl=7 * 86400, prefix="listing_content", decode=ListingContent.from_dict)
     async def create_listing_async(self, product: ProductAnalysis, market: MarketData) -> ListingContent:
         # TODO: GPT-4 für Title + Description Generation
         # Template-basiert für Konsistenz und Speed
         pass
+    
+    async def create_listings_async(
+        self,
+        items: List[tuple[ProductAnalysis, MarketData]]
+    ) -> List[ListingContent | BaseException]:
+        """Fan-out unter Semaphore statt sequenzieller Round-Trips (OpenAI RPM-Limit)"""
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        
+        async def bounded(product: ProductAnalysis, market: MarketData) -> ListingContent:
+            async with semaphore:
+                return await self.create_listing_async(product, market)
+        
+        return await asyncio.gather(
+            *(bounded(product, market) for product, market in items),
+            return_exceptions=True
+        )
 
-class EbayAPIClient:
+class EbayAPIClient(PooledHTTPComponent):
     """🔄 eBay Trading API Wrapper"""
     
-    def __init__(self):
+    # AddItems akzeptiert max. 5 Items; Calls werden max. 200ms gesammelt
+    BATCH_SIZE = 5
+    BATCH_WINDOW_SECONDS = 0.2
+    
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        super().__init__(session)
         self.auth_token = None  # OAuth 2.0
         self.sandbox_mode = True  # Für Development
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
     
     async def create_listing_async(self, listing: ListingContent, images: List[str]) -> str:
-        # TODO: eBay Trading API Integration
+        """Einzelnes Listing - wird mit parallelen Calls zu einem AddItems-Batch gebündelt"""
+        if self._batcher is None or self._batcher.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._run_batcher())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((listing, images, future))
+        return await future
+    
+    async def create_listings_batch_async(
+        self,
+        listings: List[ListingContent],
+        images: List[List[str]]
+    ) -> List[str]:
+        # TODO: eBay Trading API AddItems (ein Request für bis zu 5 Listings)
         # Retry-Logic für Reliability
         pass
+    
+    async def close(self):
+        """Batcher beim Shutdown stoppen und wartende Aufrufer mit Fehler beenden"""
+        if self._batcher is not None:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+            self._batcher = None
+        
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, _, future = self._queue.get_nowait()
+                self._fail_futures([future], RuntimeError("eBay client closed"))
+    
+    @staticmethod
+    def _fail_futures(futures, exc: BaseException):
+        for future in futures:
+            if not future.done():
+                future.set_exception(exc)
+    
+    async def _run_batcher(self):
+        """Request Coalescing: sammelt bis BATCH_SIZE Items oder bis das Zeitfenster abläuft"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self.BATCH_WINDOW_SECONDS
+                
+                while len(batch) < self.BATCH_SIZE:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                
+                listings, images, futures = zip(*batch)
+                item_ids = list(await self.create_listings_batch_async(list(listings), list(images)) or [])
+            except asyncio.CancelledError:
+                # Shutdown mitten im Batch: kein Aufrufer darf ewig auf sein Future warten
+                self._fail_futures([future for _, _, future in batch], RuntimeError("eBay client closed"))
+                raise
+            except Exception as e:
+                self._fail_futures([future for _, _, future in batch], e)
+                continue
+            
+            for future, item_id in zip(futures, item_ids):
+                if not future.done():
+                    future.set_result(item_id)
+            if len(item_ids) != len(futures):
+                self._fail_futures(
+                    futures[len(item_ids):],
+                    RuntimeError(f"AddItems returned {len(item_ids)} ids for {len(futures)} listings")
+                )
 
 # 🚀 PERFORMANCE OPTIMIERUNGEN
 """
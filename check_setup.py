@@ -9,9 +9,9 @@ import sys
 from dotenv import load_dotenv
 import asyncio
 import aiohttp
-import redis
+import redis.asyncio as redis
 import psycopg
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 # Load environment variables
 load_dotenv()
@@ -21,6 +21,24 @@ class SetupChecker:
         self.results: Dict[str, bool] = {}
         self.missing_keys: List[str] = []
         self.working_keys: List[str] = []
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def __aenter__(self) -> "SetupChecker":
+        """Open one shared HTTP session (keep-alive) for all API probes"""
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=20,
+                ttl_dns_cache=300,
+                keepalive_timeout=30
+            )
+        )
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._session:
+            await self._session.close()
+            self._session = None
         
     async def check_openai_api(self) -> bool:
         """Test OpenAI API Key"""
@@ -29,10 +47,9 @@ class SetupChecker:
             return False
             
         try:
-            async with aiohttp.ClientSession() as session:
-                headers = {'Authorization': f'Bearer {api_key}'}
-                async with session.get('https://api.openai.com/v1/models', headers=headers) as resp:
-                    return resp.status == 200
+            headers = {'Authorization': f'Bearer {api_key}'}
+            async with self._session.get('https://api.openai.com/v1/models', headers=headers) as resp:
+                return resp.status == 200
         except Exception as e:
             print(f"❌ OpenAI API Error: {e}")
             return False
@@ -54,14 +71,13 @@ class SetupChecker:
                 'keywords': 'test'
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as resp:
-                    return resp.status == 200
+            async with self._session.get(url, params=params) as resp:
+                return resp.status == 200
         except Exception as e:
             print(f"❌ eBay API Error: {e}")
             return False
     
-    def check_database(self) -> bool:
+    async def check_database(self) -> bool:
         """Test Database Connection"""
         db_url = os.getenv('DATABASE_URL', '')
         if not db_url:
@@ -69,27 +85,31 @@ class SetupChecker:
             
         try:
             # Test PostgreSQL connection
-            with psycopg.connect(db_url, connect_timeout=5) as conn:
-                with conn.cursor() as cur:
-                    cur.execute('SELECT 1')
-                    return cur.fetchone() == (1,)
+            async with await psycopg.AsyncConnection.connect(db_url, connect_timeout=5) as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute('SELECT 1')
+                    return await cur.fetchone() == (1,)
         except Exception as e:
             print(f"❌ Database Error: {e}")
             return False
     
-    def check_redis(self) -> bool:
+    async def check_redis(self) -> bool:
         """Test Redis Connection"""
         redis_url = os.getenv('REDIS_URL', '')
         if not redis_url:
             return False
             
+        r = None
         try:
             r = redis.from_url(redis_url, socket_timeout=5)
-            r.ping()
+            await r.ping()
             return True
         except Exception as e:
             print(f"❌ Redis Error: {e}")
             return False
+        finally:
+            if r is not None:
+                await r.aclose()
     
     async def run_all_checks(self):
         """Run all setup checks"""
@@ -116,41 +136,46 @@ class SetupChecker:
         
         print("\n🔌 **API Connectivity Check:**")
         
+        # Run all probes concurrently
+        openai_ok, ebay_ok, db_ok, redis_ok = await asyncio.gather(
+            self.check_openai_api(),
+            self.check_ebay_api(),
+            self.check_database(),
+            self.check_redis(),
+            return_exceptions=True
+        )
+        self.results['openai'] = openai_ok is True
+        self.results['ebay'] = ebay_ok is True
+        self.results['database'] = db_ok is True
+        self.results['redis'] = redis_ok is True
+        
         # Test OpenAI
         print("🤖 Testing OpenAI API...", end=" ")
-        if await self.check_openai_api():
+        if self.results['openai']:
             print("✅ Working!")
-            self.results['openai'] = True
         else:
             print("❌ Failed")
-            self.results['openai'] = False
         
         # Test eBay
         print("🛒 Testing eBay API...", end=" ")
-        if await self.check_ebay_api():
+        if self.results['ebay']:
             print("✅ Working!")
-            self.results['ebay'] = True
         else:
             print("❌ Failed (Normal if not configured yet)")
-            self.results['ebay'] = False
         
         # Test Database
         print("🗄️  Testing Database...", end=" ")
-        if self.check_database():
+        if self.results['database']:
             print("✅ Connected!")
-            self.results['database'] = True
         else:
             print("❌ Failed (Use Docker: docker-compose up -d)")
-            self.results['database'] = False
         
         # Test Redis
         print("⚡ Testing Redis...", end=" ")
-        if self.check_redis():
+        if self.results['redis']:
             print("✅ Connected!")
-            self.results['redis'] = True
         else:
             print("❌ Failed (Use Docker: docker-compose up -d)")
-            self.results['redis'] = False
         
         # Summary
         print(f"\n📊 **Setup Summary:**")
@@ -172,10 +197,13 @@ class SetupChecker:
             if not self.results.get('ebay'):
                 print("3. Configure eBay API keys (optional for now)")
 
+async def _run_checks():
+    async with SetupChecker() as checker:
+        await checker.run_all_checks()
+
 def main():
     """Main entry point"""
-    checker = SetupChecker()
-    asyncio.run(checker.run_all_checks())
+    asyncio.run(_run_checks())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+🌐 Shared HTTP Client
+Eine einzige aiohttp.ClientSession für alle ausgehenden API-Calls (OpenAI, eBay, Bilder)
+"""
+
+from typing import Optional
+
+import aiohttp
+
+# 🚀 PROCESS-WIDE SESSION (Connection Pooling + Keep-Alive)
+_session: Optional[aiohttp.ClientSession] = None
+
+def get_session() -> aiohttp.ClientSession:
+    """Lazy erstellte, geteilte Session mit getuntem Connector"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=200,
+                limit_per_host=32,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True
+            ),
+            timeout=aiohttp.ClientTimeout(total=30, connect=5)
+        )
+    return _session
+
+async def close_session() -> None:
+    """Session beim Shutdown schließen"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -5,16 +5,27 @@ Blazing Fast FastAPI Backend mit allem was das Herz begehrt!
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse
 import asyncio
+import os
 from typing import List, Optional
 import uvicorn
 import redis
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from contextlib import asynccontextmanager
-import json
-from datetime import datetime
+from contextlib import asynccontextmanager, suppress
+from dataclasses import asdict
+from jinja2 import DictLoader, Environment
+import orjson
+import time
+import uuid
+from datetime import datetime, timezone
+from PIL import Image, UnidentifiedImageError
 
+from ai_client import close_openai_client
+from http_client import close_session
+from image_prep import decode_and_resize
+from redis_cache import close_redis
 from architecture import (
     EbayAutomationEngine, 
     ProductAnalysis, 
@@ -25,7 +36,7 @@ from architecture import (
 
 # 🚀 GLOBAL INSTANCES (Singleton Pattern für Performance)
 automation_engine = EbayAutomationEngine()
-redis_client = redis.asyncio.Redis(host='localhost', port=6379, db=0)
+redis_client = redis.asyncio.Redis(host='localhost', port=6379, db=0, decode_responses=True)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -33,17 +44,26 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 eBay Automation Engine starting up...")
     # TODO: Database connection, Redis connection tests
+    listener = asyncio.create_task(listen_job_updates())
     yield
     # Shutdown  
     print("🔄 Graceful shutdown...")
+    listener.cancel()
+    with suppress(asyncio.CancelledError):
+        await listener
+    await automation_engine.ebay_client.close()
     await redis_client.close()
+    await close_session()
+    await close_openai_client()
+    await close_redis()
 
 # 🔥 FASTAPI APP SETUP
 app = FastAPI(
     title="eBay Automation API",
     description="KI-powered eBay listing creation tool",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS für Frontend Development
@@ -55,6 +75,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Gzip für HTML-Previews und größere JSON-Antworten (Job-Results)
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
+
 class ProcessingJob:
     """Job Status Tracking für Async Processing"""
     def __init__(self, job_id: str):
@@ -63,10 +86,98 @@ class ProcessingJob:
         self.progress = 0
         self.result = None
         self.error = None
-        self.created_at = datetime.now()
+        self.processing_time_ms: Optional[int] = None
+        # Start-Epoch liegt im Hash: die Laufzeit zählt ab Job-Erstellung,
+        # auch wenn der Job zwischendurch (von einem anderen Worker) neu geladen wird
+        self.started_at = time.time()
+        self.created_at = datetime.fromtimestamp(self.started_at, timezone.utc)
+    
+    def elapsed_ms(self) -> int:
+        return int((time.time() - self.started_at) * 1000)
+    
+    def to_redis(self) -> dict[str, str | bytes]:
+        """Flaches Mapping für HSET (Redis Hashes kennen nur Strings)"""
+        return {
+            "job_id": self.job_id,
+            "status": self.status.value,
+            "progress": str(self.progress),
+            "result": orjson.dumps(self.result),
+            "error": self.error or "",
+            "processing_time_ms": "" if self.processing_time_ms is None else str(self.processing_time_ms),
+            "created_at": self.created_at.isoformat(),
+            "started_at": repr(self.started_at)
+        }
+    
+    @classmethod
+    def from_redis(cls, data: dict[str, str]) -> "ProcessingJob":
+        job = cls(data["job_id"])
+        job.status = ListingStatus(data["status"])
+        job.progress = int(data["progress"])
+        job.result = orjson.loads(data["result"])
+        job.error = data["error"] or None
+        job.processing_time_ms = int(data["processing_time_ms"]) if data.get("processing_time_ms") else None
+        job.created_at = datetime.fromisoformat(data["created_at"])
+        job.started_at = float(data["started_at"]) if data.get("started_at") else job.created_at.timestamp()
+        return job
+
+# 📦 REDIS JOB STORE (Hash pro Job + Pub/Sub für Status-Updates, Worker-übergreifend)
+JOB_TTL_SECONDS = 86400
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+async def save_job(job: ProcessingJob):
+    """Job-Hash schreiben, TTL erneuern und Fortschritt publizieren"""
+    key = job_key(job.job_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=job.to_redis())
+        pipe.expire(key, JOB_TTL_SECONDS)
+        pipe.publish(key, job.progress)
+        await pipe.execute()
+
+async def load_job(job_id: str) -> ProcessingJob:
+    """Job aus Redis laden (404 wenn unbekannt oder abgelaufen)"""
+    data = await redis_client.hgetall(job_key(job_id))
+    if not data:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return ProcessingJob.from_redis(data)
+
+# ⏳ LONG-POLL WAITERS (ein asyncio.Event pro Job, per Pub/Sub von jedem Worker geweckt)
+LONG_POLL_TIMEOUT = 25
+FINAL_STATUSES = (ListingStatus.READY, ListingStatus.PUBLISHED, ListingStatus.ERROR)
+# Nur Jobs mit aktiven Waitern stehen hier drin; Job-Daten selbst verfallen per Redis EXPIRE
+job_events: dict[str, set[asyncio.Event]] = {}
 
-# 📦 IN-MEMORY JOB STORE (Für MVP, später Redis/Database)
-jobs: dict[str, ProcessingJob] = {}
+def notify_job(job_id: str):
+    """Alle Waiter eines Jobs wecken; neue Waiter registrieren sich neu"""
+    for event in job_events.pop(job_id, ()):
+        event.set()
+
+LISTENER_MAX_BACKOFF = 30
+
+async def listen_job_updates():
+    """
+    Ein Pub/Sub-Listener pro Worker statt einer Subscription pro Request.
+    Redis weg oder Verbindung abgerissen → loggen und mit Backoff neu verbinden
+    """
+    backoff = 1
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.psubscribe("job:*")
+            backoff = 1
+            # Während der Lücke verpasste Updates: alle Waiter einmal neu prüfen lassen
+            for job_id in list(job_events):
+                notify_job(job_id)
+            async for message in pubsub.listen():
+                if message["type"] == "pmessage":
+                    notify_job(message["channel"].split(":", 1)[1])
+        except Exception as e:
+            print(f"⚠️ Job-Listener getrennt ({e}), Reconnect in {backoff}s")
+        finally:
+            await pubsub.aclose()
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, LISTENER_MAX_BACKOFF)
 
 @app.get("/")
 async def root():
@@ -77,6 +188,26 @@ async def root():
         "version": "1.0.0"
     }
 
+# 📸 UPLOAD-VORVERARBEITUNG (kleinere Bilder → schnellere + günstigere Vision-Calls)
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+async def read_upload_for_vision(file: UploadFile) -> bytes:
+    """Upload in Chunks lesen, Größe prüfen und komprimieren (CPU-Teil im Thread)"""
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buffer.extend(chunk)
+        if len(buffer) > MAX_UPLOAD_SIZE:
+            raise HTTPException(status_code=413, detail="Image size must be less than 10MB")
+    
+    try:
+        return await asyncio.to_thread(decode_and_resize, bytes(buffer))
+    except Image.DecompressionBombError:
+        # Kleine Datei, die eine riesige Pixelzahl deklariert
+        raise HTTPException(status_code=413, detail="Image dimensions too large")
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=400, detail="File must be a valid image")
+
 @app.post("/analyze-product")
 async def analyze_product_image(
     background_tasks: BackgroundTasks,
@@ -89,13 +220,15 @@ async def analyze_product_image(
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Job-ID generieren
-    import uuid
-    job_id = str(uuid.uuid4())
-    jobs[job_id] = ProcessingJob(job_id)
+    # Bild noch im Request lesen: das UploadFile ist im Background Task bereits geschlossen
+    image_data = await read_upload_for_vision(file)
+    
+    # Job-ID generieren (hex: ohne Bindestriche, kompakter Redis-Key)
+    job_id = uuid.uuid4().hex
+    await save_job(ProcessingJob(job_id))
     
     # Async Background Processing starten
-    background_tasks.add_task(process_product_pipeline, job_id, file)
+    background_tasks.add_task(process_product_pipeline, job_id, image_data)
     
     return {
         "job_id": job_id,
@@ -103,21 +236,21 @@ async def analyze_product_image(
         "status_url": f"/status/{job_id}"
     }
 
-async def process_product_pipeline(job_id: str, file: UploadFile):
+async def process_product_pipeline(job_id: str, image_data: bytes):
     """
     🔄 Komplette Processing Pipeline (Async Background Task)
     1. Bildanalyse → 2. Marktforschung → 3. Content-Generierung → 4. Listing-Vorbereitung
     """
-    job = jobs[job_id]
+    job = await load_job(job_id)
     
     try:
         # STEP 1: Bildanalyse
         job.status = ListingStatus.ANALYZING
         job.progress = 20
+        await save_job(job)
         
-        # TODO: Save uploaded file temporarily
-        # image_url = await save_temp_image(file)
-        # product_analysis = await automation_engine.process_product_image(image_url)
+        # TODO: Vision-Analyse der komprimierten Bytes (Cache-Key = SHA-256 der Bytes)
+        # product_analysis = await automation_engine.process_product_image_data(image_data)
         
         # MOCK für Development
         product_analysis = ProductAnalysis(
@@ -132,52 +265,80 @@ async def process_product_pipeline(job_id: str, file: UploadFile):
         # STEP 2: Marktforschung  
         job.status = ListingStatus.RESEARCHING
         job.progress = 50
+        await save_job(job)
         
         market_data = await automation_engine.research_market(product_analysis)
         
         # STEP 3: Content-Generierung
         job.status = ListingStatus.GENERATING
         job.progress = 80
+        await save_job(job)
         
         listing_content = await automation_engine.generate_listing(product_analysis, market_data)
         
         # STEP 4: Fertig!
         job.status = ListingStatus.READY
         job.progress = 100
+        job.processing_time_ms = job.elapsed_ms()
         job.result = {
-            "product": product_analysis.__dict__,
-            "market": market_data.__dict__,
-            "listing": listing_content.__dict__
+            "product": asdict(product_analysis),
+            "market": asdict(market_data),
+            "listing": asdict(listing_content)
         }
+        await save_job(job)
         
     except Exception as e:
         job.status = ListingStatus.ERROR
         job.error = str(e)
+        await save_job(job)
         print(f"❌ Error in job {job_id}: {e}")
 
-@app.get("/status/{job_id}")
-async def get_job_status(job_id: str):
-    """📊 Job Status abrufen (für Frontend Polling)"""
-    if job_id not in jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = jobs[job_id]
+def job_status_payload(job: ProcessingJob) -> dict:
     return {
-        "job_id": job_id,
+        "job_id": job.job_id,
         "status": job.status.value,
         "progress": job.progress,
         "result": job.result,
         "error": job.error,
+        "processing_time_ms": job.processing_time_ms,
         "created_at": job.created_at.isoformat()
     }
 
+@app.get("/status/{job_id}")
+async def get_job_status(job_id: str):
+    """📊 Job Status abrufen (für Frontend Polling)"""
+    return job_status_payload(await load_job(job_id))
+
+@app.get("/status/{job_id}/wait")
+async def wait_job_status(job_id: str, since: int = -1):
+    """
+    ⏳ Long-Poll: antwortet sobald sich der Fortschritt gegenüber `since` ändert
+    (oder nach 25s); der Client verbindet sich danach einfach neu
+    """
+    # Event vor dem Laden registrieren, damit kein Update verloren geht
+    event = asyncio.Event()
+    job_events.setdefault(job_id, set()).add(event)
+    try:
+        job = await load_job(job_id)
+        if job.progress == since and job.status not in FINAL_STATUSES:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=LONG_POLL_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            job = await load_job(job_id)
+    finally:
+        # Timeout/404/fertiger Job: Eintrag sofort wieder entfernen (kein Wachstum über die Uptime)
+        waiters = job_events.get(job_id)
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                del job_events[job_id]
+    return job_status_payload(job)
+
 @app.post("/publish-listing/{job_id}")
 async def publish_listing(job_id: str):
     """🚀 Fertiges Listing auf eBay veröffentlichen"""
-    if job_id not in jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = jobs[job_id]
+    job = await load_job(job_id)
     if job.status != ListingStatus.READY:
         raise HTTPException(status_code=400, detail="Listing not ready for publishing")
     
@@ -188,6 +349,7 @@ async def publish_listing(job_id: str):
         
         job.status = ListingStatus.PUBLISHED
         job.result["ebay_item_id"] = ebay_item_id
+        await save_job(job)
         
         return {
             "success": True,
@@ -198,50 +360,68 @@ async def publish_listing(job_id: str):
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+# 👀 PREVIEW RENDERING (Template einmalig beim Import kompiliert statt f-String pro Request)
+# Die Beschreibung ist generiertes HTML und wird bewusst nicht escaped.
+PREVIEW_TEMPLATE_SOURCE = """<!DOCTYPE html>
+<html>
+<head>
+    <title>{{ listing.title }}</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; }
+        .price { color: #e53e3e; font-size: 24px; font-weight: bold; }
+    </style>
+</head>
+<body>
+    <h1>{{ listing.title }}</h1>
+    <div class="price">Startpreis: {{ listing.starting_price }}€</div>
+    <div>{{ listing.description|safe }}</div>
+    <p>Keywords: {{ listing.keywords|join(', ') }}</p>
+</body>
+</html>
+"""
+
+_jinja_env = Environment(
+    loader=DictLoader({"preview.html": PREVIEW_TEMPLATE_SOURCE}),
+    autoescape=True
+)
+PREVIEW_TEMPLATE = _jinja_env.get_template("preview.html")
+
 @app.get("/preview/{job_id}")
 async def preview_listing(job_id: str):
     """👀 HTML Preview der generierten Auktion"""
-    if job_id not in jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = jobs[job_id]
+    job = await load_job(job_id)
     if not job.result:
         raise HTTPException(status_code=400, detail="No result available")
     
     listing = job.result["listing"]
     
-    # Simple HTML Preview
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>{listing['title']}</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 20px; }}
-            .price {{ color: #e53e3e; font-size: 24px; font-weight: bold; }}
-        </style>
-    </head>
-    <body>
-        <h1>{listing['title']}</h1>
-        <div class="price">Startpreis: {listing['starting_price']}€</div>
-        <div>{listing['description']}</div>
-        <p>Keywords: {', '.join(listing['keywords'])}</p>
-    </body>
-    </html>
-    """
+    # Simple HTML Preview (vorkompiliertes Template, Autoescaping)
+    html_content = PREVIEW_TEMPLATE.render(listing=listing)
     
-    return StreamingResponse(
-        iter([html_content]), 
-        media_type="text/html"
-    )
+    # GZipMiddleware komprimiert den Body; kein Streaming-Wrapper nötig
+    return HTMLResponse(content=html_content)
 
-# 🚀 DEVELOPMENT SERVER
+# 🚀 SERVER
+# Production (ENV=prod): uvloop + httptools, kein Reload. Worker-Anzahl über
+# WEB_CONCURRENCY (Faustregel: 1 Worker pro CPU-Kern); Job-State liegt in Redis,
+# daher teilen sich alle Worker dieselben Jobs.
 if __name__ == "__main__":
     print("🔥 Starting eBay Automation API...")
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0", 
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    if os.getenv("ENV") == "prod":
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            loop="uvloop",
+            http="httptools",
+            workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+            log_level="warning"
+        )
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0", 
+            port=8000,
+            reload=True,
+            log_level="info"
+        )
\ No newline at end of file
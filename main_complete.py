@@ -5,26 +5,36 @@ Production-ready FastAPI Backend mit allen Services integriert
 
 import asyncio
 import os
+import time
 import uuid
-import json
-from datetime import datetime, timedelta
+import orjson
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Any
 
 # FastAPI & Dependencies
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Depends, status
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.datastructures import UploadFile  # request.form() liefert Starlettes Klasse
 from contextlib import asynccontextmanager
 
+# Image normalization before the vision call
+from image_prep import decode_and_resize
+
 # Database
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload, sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+from sqlalchemy import func, lambda_stmt, select, update, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 # Redis for caching and job queues
 import redis.asyncio as redis
+import xxhash
 
 # Pydantic Models
 from pydantic import BaseModel, ValidationError
@@ -36,7 +46,7 @@ from services.content_service import create_content_service, ListingContent
 
 # Database Models
 from database.models import (
-    User, Listing, ProcessingLog, UserAnalytics, APIUsageLog,
+    User, Listing, UserAnalytics, APIUsageLog,
     ListingStatus, ProcessingStatus, UserPlan,
     UserCreate, UserResponse, ListingResponse, ProcessingLogResponse
 )
@@ -46,6 +56,15 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# UTC-Zeitstempel ohne die in 3.12 deprecateten utcnow()/utcfromtimestamp()
+def utc_now() -> datetime:
+    """Naive UTC für die DB-Spalten (wie utc_now in main_optimized.py)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def utc_from_timestamp(ts: float) -> datetime:
+    """Epoch-Sekunden aus dem Redis-Job-Hash → aware UTC datetime"""
+    return datetime.fromtimestamp(ts, timezone.utc)
+
 # ================================
 # Configuration & Environment
 # ================================
@@ -75,6 +94,10 @@ class Settings:
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     SUPPORTED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/png", "image/webp"]
     
+    # Max. gleichzeitige OpenAI-Calls pro Worker (Vision / GPT getrennt, eigene Rate Limits)
+    VISION_CONCURRENCY: int = int(os.getenv("VISION_CONCURRENCY", "4"))
+    GPT_CONCURRENCY: int = int(os.getenv("GPT_CONCURRENCY", "4"))
+    
     # Plan Limits
     PLAN_LIMITS = {
         UserPlan.FREE: {"monthly_listings": 10, "api_priority": 3},
@@ -98,12 +121,36 @@ ebay_service = create_ebay_service(
 content_service = create_content_service(settings.OPENAI_API_KEY)
 
 # Database Engine
+def _engine_options(database_url: str) -> Dict[str, Any]:
+    """Pool options per driver (QueuePool sizing is ignored by SQLite)"""
+    
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        options: Dict[str, Any] = {"connect_args": {"check_same_thread": False}}
+        # Only in-memory DBs need one shared connection (each new one would be empty);
+        # file-backed SQLite keeps the default pool so sessions don't share a transaction
+        if url.database in (None, "", ":memory:"):
+            options["poolclass"] = StaticPool
+        return options
+    
+    return {
+        "pool_size": 20,
+        "max_overflow": 40,     # Burst-Reserve für lange laufende Pipelines
+        "pool_timeout": 30,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800
+    }
+
+# Plain postgresql:// URLs would fall back to psycopg; force asyncpg
+DATABASE_URL = settings.DATABASE_URL
+if DATABASE_URL.startswith("postgresql://"):
+    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
 engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=True if os.getenv("DEBUG") == "1" else False,
-    pool_size=20,
-    max_overflow=0,
-    pool_pre_ping=True
+    DATABASE_URL,
+    # SQL-Logging nur explizit: echo schreibt synchron nach stdout auf jedem Statement
+    echo=os.getenv("SQL_ECHO") == "1",
+    **_engine_options(DATABASE_URL)
 )
 
 AsyncSessionLocal = sessionmaker(
@@ -112,16 +159,24 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
-# Redis Client
+# Redis Client (single source of truth for processing jobs)
 redis_client: Optional[redis.Redis] = None
 
-# Job Storage (in production: use Redis/Database)
-processing_jobs: Dict[str, Dict] = {}
+JOB_TTL_SECONDS = 3600  # 1 hour
 
 # ================================
 # Database Dependency
 # ================================
 
+# Compiled once; health checks reuse the same statement
+SELECT_ONE = text("SELECT 1")
+
+async def test_connection() -> bool:
+    """Cheap DB round-trip on a raw connection (no session/transaction)"""
+    async with engine.connect() as conn:
+        result = await conn.execute(SELECT_ONE)
+        return result.scalar() == 1
+
 async def get_db() -> AsyncSession:
     """Database session dependency"""
     async with AsyncSessionLocal() as session:
@@ -190,13 +245,13 @@ async def lifespan(app: FastAPI):
         await redis_client.ping()
         logger.info("✅ Redis connected successfully")
     except Exception as e:
-        logger.warning(f"⚠️ Redis connection failed: {e}")
-        redis_client = None
+        # Jobs live only in Redis, so the API cannot run without it
+        logger.error(f"❌ Redis connection failed: {e}")
+        raise
     
     # Test database connection
     try:
-        async with AsyncSessionLocal() as session:
-            await session.execute(select(1))
+        await test_connection()
         logger.info("✅ Database connected successfully")
     except Exception as e:
         logger.error(f"❌ Database connection failed: {e}")
@@ -217,7 +272,8 @@ app = FastAPI(
     title="eBay Automation API",
     description="KI-powered eBay listing creation and optimization tool",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Middleware
@@ -229,7 +285,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """GZip except for SSE streams (the compressor would hold events back)"""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=1000)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MULTIPART_OVERHEAD = 64 * 1024  # Boundaries + Part-Header
+
+def upload_too_large_detail() -> str:
+    return f"File too large. Maximum size: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
+
+class UploadSizeLimitMiddleware:
+    """
+    413 anhand von Content-Length, bevor der Multipart-Body gelesen wird.
+    Pure ASGI und nur für den Upload-Pfad (kein BaseHTTPMiddleware um SSE/Background Tasks)
+    """
+    
+    def __init__(self, app, path: str, max_body_size: int):
+        self.app = app
+        self.path = path
+        self.max_body_size = max_body_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == self.path:
+            content_length = dict(scope["headers"]).get(b"content-length", b"")
+            if content_length.isdigit() and int(content_length) > self.max_body_size:
+                response = ORJSONResponse(
+                    status_code=413,
+                    content={
+                        "error": upload_too_large_detail(),
+                        "status_code": 413,
+                        "timestamp": utc_now().isoformat()
+                    }
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path="/analyze-product",
+    max_body_size=settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD
+)
 
 # ================================
 # Pydantic Request/Response Models
@@ -272,38 +376,102 @@ class ListingContentResponse(BaseModel):
 # Utility Functions
 # ================================
 
-async def log_api_usage(
+API_USAGE_COLUMNS = [
+    "user_id", "api_service", "success", "cost_cents",
+    "tokens_used", "response_time_ms", "created_at"
+]
+
+def api_usage_record(
     user_id: int,
     api_service: str,
     success: bool,
     cost_cents: int = 0,
     tokens_used: int = 0,
-    response_time_ms: int = 0,
-    db: AsyncSession = None
-):
-    """Log API usage for analytics and billing"""
-    
-    if db:
-        log_entry = APIUsageLog(
-            user_id=user_id,
-            api_service=api_service,
-            success=success,
-            cost_cents=cost_cents,
-            tokens_used=tokens_used,
-            response_time_ms=response_time_ms
+    response_time_ms: int = 0
+) -> tuple:
+    """Build one APIUsageLog row (column order matches API_USAGE_COLUMNS)"""
+    
+    return (
+        user_id, api_service, success, cost_cents,
+        tokens_used, response_time_ms, utc_now()
+    )
+
+async def flush_api_usage(db: AsyncSession, records: List[tuple]):
+    """
+    Write buffered API usage rows in one round-trip (asyncpg COPY).
+    Joins the session's transaction; the caller commits.
+    """
+    
+    if not records:
+        return
+    
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    
+    if hasattr(driver, "copy_records_to_table"):
+        await driver.copy_records_to_table(
+            APIUsageLog.__tablename__,
+            records=records,
+            columns=API_USAGE_COLUMNS
+        )
+    else:
+        # Non-asyncpg drivers (SQLite dev): single executemany INSERT
+        await db.execute(
+            APIUsageLog.__table__.insert(),
+            [dict(zip(API_USAGE_COLUMNS, record)) for record in records]
         )
-        db.add(log_entry)
-        await db.commit()
 
-async def check_user_limits(user: User, action: str = "create_listing") -> bool:
-    """Check if user can perform action based on plan limits"""
+async def reserve_listing_quota(db: AsyncSession, user: User) -> bool:
+    """
+    Atomically count one listing against the user's monthly plan limit.
+    Returns False if the limit is already reached (no row updated).
+    """
     
     plan_limits = settings.PLAN_LIMITS.get(user.plan, settings.PLAN_LIMITS[UserPlan.FREE])
     
-    if action == "create_listing":
-        return user.monthly_listings_used < plan_limits["monthly_listings"]
+    result = await db.execute(
+        update(User)
+        .where(
+            User.id == user.id,
+            User.monthly_listings_used < plan_limits["monthly_listings"]
+        )
+        .values(monthly_listings_used=User.monthly_listings_used + 1)
+        .returning(User.id)
+    )
+    return result.scalar_one_or_none() is not None
+
+async def release_listing_quota(db: AsyncSession, user: User):
+    """Undo reserve_listing_quota when no job could be started (caller commits)"""
+    
+    await db.execute(
+        update(User)
+        .where(User.id == user.id, User.monthly_listings_used > 0)
+        .values(monthly_listings_used=User.monthly_listings_used - 1)
+    )
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+async def create_job(job_id: str, user_id: int):
+    """Create job hash in Redis (timestamps as epoch floats)"""
     
-    return True
+    now = time.time()
+    key = job_key(job_id)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hset(key, mapping={
+            "job_id": job_id,
+            "status": ProcessingStatus.PENDING.value,
+            "progress": 0,
+            "current_step": "Warteschlange...",
+            "result": "",
+            "error": "",
+            "created_at": now,
+            "updated_at": now,
+            "user_id": user_id
+        })
+        pipe.expire(key, JOB_TTL_SECONDS)
+        await pipe.execute()
 
 async def update_job_status(
     job_id: str, 
@@ -313,106 +481,204 @@ async def update_job_status(
     result: Dict = None,
     error: str = None
 ):
-    """Update job status in storage"""
-    
-    if job_id in processing_jobs:
-        processing_jobs[job_id].update({
-            "status": status.value,
-            "progress": progress,
-            "current_step": current_step,
-            "result": result,
-            "error": error,
-            "updated_at": datetime.utcnow()
-        })
-        
-        # Also update in Redis if available
-        if redis_client:
-            try:
-                await redis_client.setex(
-                    f"job:{job_id}",
-                    3600,  # 1 hour TTL
-                    json.dumps(processing_jobs[job_id], default=str)
-                )
-            except Exception as e:
-                logger.warning(f"Failed to update job in Redis: {e}")
+    """Update job status in Redis"""
+    
+    key = job_key(job_id)
+    now = time.time()
+    # orjson serialisiert datetime/Enum nativ; default nur für Exoten (Decimal)
+    encoded_result = orjson.dumps(result, default=str) if result is not None else None
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping={
+                "status": status.value,
+                "progress": progress,
+                "current_step": current_step,
+                "result": encoded_result or "",
+                "error": error or "",
+                "updated_at": now
+            })
+            pipe.expire(key, JOB_TTL_SECONDS)
+            # Push an /job-status/{id}/stream subscribers (result nicht doppelt encodieren)
+            pipe.publish(key, orjson.dumps({
+                "job_id": job_id,
+                "status": status.value,
+                "progress": progress,
+                "current_step": current_step,
+                "result": orjson.Fragment(encoded_result) if encoded_result else None,
+                "error": error,
+                "updated_at": utc_from_timestamp(now)
+            }))
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to update job in Redis: {e}")
+
+def job_from_hash(data: Dict[str, str]) -> Dict[str, Any]:
+    """Coerce Redis hash fields back into JobStatusResponse values"""
+    
+    return {
+        "job_id": data["job_id"],
+        "status": data["status"],
+        "progress": int(data["progress"]),
+        "current_step": data["current_step"],
+        "result": orjson.loads(data["result"]) if data["result"] else None,
+        "error": data["error"] or None,
+        "created_at": utc_from_timestamp(float(data["created_at"])),
+        "updated_at": utc_from_timestamp(float(data["updated_at"]))
+    }
+
+VISION_CACHE_TTL_SECONDS = 30 * 86400  # 30 days
+
+def vision_cache_key(image_data: bytes) -> str:
+    return f"vision:{xxhash.xxh3_128_hexdigest(image_data)}"
+
+async def get_cached_vision_result(image_data: bytes) -> Optional[VisionAnalysisResult]:
+    """Return a cached vision analysis for identical image bytes (cache errors = miss)"""
+    
+    try:
+        cached = await redis_client.get(vision_cache_key(image_data))
+        if cached:
+            return VisionAnalysisResult.model_validate_json(cached)
+    except Exception as e:
+        logger.warning(f"Vision cache read failed: {e}")
+    return None
+
+async def cache_vision_result(image_data: bytes, vision_result: VisionAnalysisResult):
+    try:
+        await redis_client.setex(
+            vision_cache_key(image_data),
+            VISION_CACHE_TTL_SECONDS,
+            vision_result.model_dump_json()
+        )
+    except Exception as e:
+        logger.warning(f"Vision cache write failed: {e}")
+
+MARKET_CACHE_TTL_SECONDS = 3600  # Marktpreise ändern sich über Stunden kaum
+
+def market_cache_key(product_name: str, category: Optional[str]) -> str:
+    normalized = product_name.strip().lower().encode()
+    return f"market:{xxhash.xxh3_128_hexdigest(normalized)}:{category or '-'}"
+
+async def get_cached_market_insights(
+    product_name: str, category: Optional[str]
+) -> Optional[EbayMarketInsights]:
+    """Market insights are shared across users for the same product (cache errors = miss)"""
+    
+    try:
+        cached = await redis_client.get(market_cache_key(product_name, category))
+        if cached:
+            return EbayMarketInsights.model_validate_json(cached)
+    except Exception as e:
+        logger.warning(f"Market cache read failed: {e}")
+    return None
+
+async def cache_market_insights(
+    product_name: str, category: Optional[str], market_insights: EbayMarketInsights
+):
+    try:
+        await redis_client.setex(
+            market_cache_key(product_name, category),
+            MARKET_CACHE_TTL_SECONDS,
+            market_insights.model_dump_json()
+        )
+    except Exception as e:
+        logger.warning(f"Market cache write failed: {e}")
 
 # ================================
 # Core Processing Pipeline
 # ================================
 
+# Backpressure: max. parallele Pipelines pro Worker (OpenAI/eBay Rate Limits)
+PIPELINE_SEM = asyncio.Semaphore(int(os.getenv("PIPELINE_CONCURRENCY", "4")))
+# Feiner: nur die OpenAI-Calls selbst; Cache-Hits und eBay-Calls laufen daran vorbei
+VISION_SEM = asyncio.Semaphore(settings.VISION_CONCURRENCY)
+GPT_SEM = asyncio.Semaphore(settings.GPT_CONCURRENCY)
+
+async def optimize_content_limited(listing_content: ListingContent):
+    async with GPT_SEM:
+        return await content_service.optimize_content(listing_content)
+
 async def process_product_pipeline(
     job_id: str,
     image_data: bytes,
     user_id: int,
-    user_preferences: Dict = None,
-    db: AsyncSession = None
+    user_preferences: Dict = None
 ):
     """
     Complete product processing pipeline:
     Image → Vision Analysis → Market Research → Content Generation
     """
     
-    try:
-        await update_job_status(job_id, ProcessingStatus.IN_PROGRESS, 10, "Initialisierung...")
-        
-        # Step 1: Vision Analysis
-        await update_job_status(job_id, ProcessingStatus.IN_PROGRESS, 20, "Bildanalyse läuft...")
-        
-        start_time = datetime.utcnow()
-        vision_result = await vision_service.analyze_product_image(image_data)
-        vision_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-        
-        await log_api_usage(
-            user_id, "openai_vision", True, 
-            cost_cents=200, response_time_ms=int(vision_time), db=db
-        )
-        
-        # Step 2: Market Research
-        await update_job_status(job_id, ProcessingStatus.IN_PROGRESS, 50, "Marktanalyse läuft...")
-        
-        start_time = datetime.utcnow()
-        market_insights = await ebay_service.analyze_market_prices(
-            vision_result.product.name,
-            vision_result.category_suggestions[0] if vision_result.category_suggestions else None
-        )
-        market_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-        
-        await log_api_usage(
-            user_id, "ebay_api", True,
-            cost_cents=50, response_time_ms=int(market_time), db=db
-        )
-        
-        # Step 3: Content Generation
-        await update_job_status(job_id, ProcessingStatus.IN_PROGRESS, 80, "Content-Erstellung läuft...")
-        
-        start_time = datetime.utcnow()
-        listing_content = await content_service.generate_listing_content(
-            vision_result, market_insights, user_preferences
-        )
-        content_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-        
-        await log_api_usage(
-            user_id, "openai_gpt", True,
-            cost_cents=150, response_time_ms=int(content_time), db=db
-        )
-        
-        # Step 4: Content Optimization Analysis
-        await update_job_status(job_id, ProcessingStatus.IN_PROGRESS, 90, "Optimierung...")
-        
-        content_optimization = await content_service.optimize_content(listing_content)
+    # Own session: the request-scoped one from get_db is closed once the
+    # response is sent and must not be held for the whole pipeline.
+    # PIPELINE_SEM first, so queued jobs don't sit on a pooled connection.
+    async with PIPELINE_SEM, AsyncSessionLocal() as db:
+        # API usage rows are buffered and written once at the end
+        usage_records: List[tuple] = []
         
-        # Prepare final result
-        result = {
-            "vision_analysis": vision_result.dict(),
-            "market_insights": market_insights.dict(),
-            "listing_content": listing_content.dict(),
-            "content_optimization": content_optimization.dict(),
-            "processing_time_ms": vision_time + market_time + content_time,
-            "estimated_listing_success": market_insights.success_probability
-        }
-        
-        # Step 5: Save to database
-        if db:
+        try:
+            await update_job_status(job_id, ProcessingStatus.IN_PROGRESS, 10, "Initialisierung...")
+            
+            # Step 1: Vision Analysis
+            await update_job_status(job_id, ProcessingStatus.IN_PROGRESS, 20, "Bildanalyse läuft...")
+            
+            start_time = time.perf_counter()
+            vision_result = await get_cached_vision_result(image_data)
+            if vision_result is None:
+                # Pillow gibt beim Decode/Resize den GIL frei → Thread reicht (wie main.py)
+                normalized = await asyncio.to_thread(decode_and_resize, image_data)
+                async with VISION_SEM:
+                    vision_result = await vision_service.analyze_product_image(normalized)
+                vision_time = (time.perf_counter() - start_time) * 1000
+                
+                await cache_vision_result(image_data, vision_result)
+                usage_records.append(api_usage_record(
+                    user_id, "openai_vision", True,
+                    cost_cents=200, response_time_ms=int(vision_time)
+                ))
+            else:
+                vision_time = (time.perf_counter() - start_time) * 1000
+            
+            # Step 2: Market Research
+            await update_job_status(job_id, ProcessingStatus.IN_PROGRESS, 50, "Marktanalyse läuft...")
+            
+            start_time = time.perf_counter()
+            product_name = vision_result.product.name
+            category = vision_result.category_suggestions[0] if vision_result.category_suggestions else None
+            market_insights = await get_cached_market_insights(product_name, category)
+            if market_insights is None:
+                market_insights = await ebay_service.analyze_market_prices(product_name, category)
+                market_time = (time.perf_counter() - start_time) * 1000
+                
+                await cache_market_insights(product_name, category, market_insights)
+                usage_records.append(api_usage_record(
+                    user_id, "ebay_api", True,
+                    cost_cents=50, response_time_ms=int(market_time)
+                ))
+            else:
+                market_time = (time.perf_counter() - start_time) * 1000
+            
+            # Step 3: Content Generation
+            await update_job_status(job_id, ProcessingStatus.IN_PROGRESS, 80, "Content-Erstellung läuft...")
+            
+            start_time = time.perf_counter()
+            async with GPT_SEM:
+                listing_content = await content_service.generate_listing_content(
+                    vision_result, market_insights, user_preferences
+                )
+            content_time = (time.perf_counter() - start_time) * 1000
+            
+            usage_records.append(api_usage_record(
+                user_id, "openai_gpt", True,
+                cost_cents=150, response_time_ms=int(content_time)
+            ))
+            
+            # Step 4: Content Optimization + Save to database (independent, run concurrently)
+            await update_job_status(job_id, ProcessingStatus.IN_PROGRESS, 90, "Optimierung...")
+            
+            # Serialize each model once; reused for the JSONB columns and the job result
+            vision_dump = vision_result.model_dump(mode="json")
+            market_dump = market_insights.model_dump(mode="json")
+            
             listing = Listing(
                 user_id=user_id,
                 product_name=vision_result.product.name,
@@ -422,36 +688,69 @@ async def process_product_pipeline(
                 subtitle=listing_content.subtitle,
                 description=listing_content.description,
                 starting_price_cents=market_insights.price_data.competitive_price,
-                vision_analysis=vision_result.dict(),
-                market_insights=market_insights.dict(),
+                vision_analysis=vision_dump,
+                market_insights=market_dump,
                 ai_confidence_score=vision_result.confidence_score,
                 seo_keywords=listing_content.seo_keywords,
                 status=ListingStatus.READY_TO_LIST
             )
-            db.add(listing)
+            
+            async def stage_listing() -> int:
+                # Only flush (INSERT + id) here; the commit waits for the optimizer
+                db.add(listing)
+                await db.flush()
+                await flush_api_usage(db, usage_records)
+                return listing.id
+            
+            # return_exceptions=True: both awaitables finish, nothing is orphaned
+            content_optimization, listing_id = await asyncio.gather(
+                optimize_content_limited(listing_content),
+                stage_listing(),
+                return_exceptions=True
+            )
+            for outcome in (content_optimization, listing_id):
+                if isinstance(outcome, BaseException):
+                    # Error path below rolls the staged Listing back
+                    raise outcome
+            
             await db.commit()
+            usage_records.clear()  # already written
             
-            result["listing_id"] = listing.id
-        
-        await update_job_status(
-            job_id, ProcessingStatus.COMPLETED, 100, 
-            "Abgeschlossen!", result=result
-        )
-        
-        logger.info(f"Processing pipeline completed for job {job_id}")
-        
-    except Exception as e:
-        error_msg = f"Processing failed: {str(e)}"
-        logger.error(f"Pipeline error for job {job_id}: {e}")
-        
-        await update_job_status(
-            job_id, ProcessingStatus.FAILED, 0, 
-            "Fehler aufgetreten", error=error_msg
-        )
-        
-        # Log failed API usage
-        if db:
-            await log_api_usage(user_id, "pipeline", False, db=db)
+            # Prepare final result
+            result = {
+                "vision_analysis": vision_dump,
+                "market_insights": market_dump,
+                "listing_content": listing_content.model_dump(mode="json"),
+                "content_optimization": content_optimization.model_dump(mode="json"),
+                "processing_time_ms": vision_time + market_time + content_time,
+                "estimated_listing_success": market_insights.success_probability,
+                "listing_id": listing_id
+            }
+            
+            await update_job_status(
+                job_id, ProcessingStatus.COMPLETED, 100, 
+                "Abgeschlossen!", result=result
+            )
+            
+            logger.info(f"Processing pipeline completed for job {job_id}")
+            
+        except Exception as e:
+            error_msg = f"Processing failed: {str(e)}"
+            logger.error(f"Pipeline error for job {job_id}: {e}")
+            
+            await update_job_status(
+                job_id, ProcessingStatus.FAILED, 0, 
+                "Fehler aufgetreten", error=error_msg
+            )
+            
+            # Log failed API usage together with whatever was accumulated
+            usage_records.append(api_usage_record(user_id, "pipeline", False))
+            try:
+                await db.rollback()
+                await flush_api_usage(db, usage_records)
+                await db.commit()
+            except Exception as log_error:
+                logger.warning(f"Failed to write API usage logs: {log_error}")
 
 # ================================
 # API Endpoints
@@ -463,7 +762,7 @@ async def root():
     return {
         "message": "🎯 eBay Automation API v1.0.0",
         "status": "healthy",
-        "timestamp": datetime.utcnow(),
+        "timestamp": utc_now(),
         "features": ["vision_analysis", "market_research", "content_generation", "listing_optimization"]
     }
 
@@ -484,8 +783,8 @@ async def health_check():
     
     # Test database
     try:
-        async with AsyncSessionLocal() as session:
-            await session.execute(select(1))
+        if not await test_connection():
+            raise RuntimeError("unexpected SELECT 1 result")
         health_status["database"] = "healthy"
     except Exception as e:
         health_status["database"] = f"error: {str(e)}"
@@ -502,10 +801,31 @@ async def health_check():
     
     return health_status
 
-@app.post("/analyze-product", response_model=ProductAnalysisResponse)
+# Der Multipart-Body wird erst nach der Quota-Reservierung gelesen (request.form()),
+# daher hier nur für die OpenAPI-Doku beschrieben statt als File(...)-Parameter
+ANALYZE_PRODUCT_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+@app.post(
+    "/analyze-product",
+    response_model=ProductAnalysisResponse,
+    openapi_extra=ANALYZE_PRODUCT_BODY
+)
 async def analyze_product(
+    request: Request,
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
     user_preferences: str = "{}",  # JSON string
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
@@ -515,58 +835,60 @@ async def analyze_product(
     Returns job ID for status polling
     """
     
-    # Validate file
-    if not file.content_type or file.content_type not in settings.SUPPORTED_IMAGE_TYPES:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"File must be one of: {', '.join(settings.SUPPORTED_IMAGE_TYPES)}"
-        )
-    
-    # Check user limits
-    if not await check_user_limits(current_user, "create_listing"):
+    # Check and count user limit in one atomic UPDATE (no check-then-increment race).
+    # Before the body is read: over-quota users get their 403 without uploading.
+    if not await reserve_listing_quota(db, current_user):
         raise HTTPException(
             status_code=403,
             detail="Monthly listing limit reached. Upgrade your plan to continue."
         )
+    await db.commit()
     
-    # Read and validate file size
-    file_content = await file.read()
-    if len(file_content) > settings.MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
-        )
+    try:
+        form = await request.form()
+        try:
+            file = form.get("file")
+            
+            # Validate file
+            if not isinstance(file, UploadFile):
+                raise HTTPException(status_code=400, detail="Missing file upload")
+            if not file.content_type or file.content_type not in settings.SUPPORTED_IMAGE_TYPES:
+                raise HTTPException(
+                    status_code=400, 
+                    detail=f"File must be one of: {', '.join(settings.SUPPORTED_IMAGE_TYPES)}"
+                )
+            
+            # Read in chunks and abort as soon as the limit is exceeded
+            buffer = bytearray()
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                buffer.extend(chunk)
+                if len(buffer) > settings.MAX_FILE_SIZE:
+                    raise HTTPException(status_code=413, detail=upload_too_large_detail())
+            file_content = bytes(buffer)
+        finally:
+            await form.close()
+        
+        # Create processing job
+        job_id = str(uuid.uuid4())
+        await create_job(job_id, current_user.id)
+    except Exception:
+        # Rejected upload or Redis failure: no job was created, give the listing back
+        await release_listing_quota(db, current_user)
+        await db.commit()
+        raise
     
     # Parse user preferences
     try:
-        preferences = json.loads(user_preferences)
-    except json.JSONDecodeError:
+        preferences = orjson.loads(user_preferences)
+    except orjson.JSONDecodeError:
         preferences = {}
     
-    # Create processing job
-    job_id = str(uuid.uuid4())
-    processing_jobs[job_id] = {
-        "job_id": job_id,
-        "status": ProcessingStatus.PENDING.value,
-        "progress": 0,
-        "current_step": "Warteschlange...",
-        "result": None,
-        "error": None,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow(),
-        "user_id": current_user.id
-    }
-    
-    # Start background processing
+    # Start background processing (only for accepted uploads)
     background_tasks.add_task(
         process_product_pipeline,
-        job_id, file_content, current_user.id, preferences, db
+        job_id, file_content, current_user.id, preferences
     )
     
-    # Update user usage
-    current_user.monthly_listings_used += 1
-    await db.commit()
-    
     return ProductAnalysisResponse(
         job_id=job_id,
         status="processing",
@@ -579,23 +901,71 @@ async def get_job_status(job_id: str):
     📊 Get processing job status and results
     """
     
-    # Check in-memory storage first
-    if job_id in processing_jobs:
-        job_data = processing_jobs[job_id]
-    # Fallback to Redis
-    elif redis_client:
+    job_data = await redis_client.hgetall(job_key(job_id))
+    if not job_data:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return JobStatusResponse(**job_from_hash(job_data))
+
+SSE_KEEPALIVE_SECONDS = 15
+FINAL_JOB_STATUSES = {ProcessingStatus.COMPLETED.value, ProcessingStatus.FAILED.value}
+
+@app.get("/job-status/{job_id}/stream")
+async def stream_job_status(job_id: str):
+    """
+    📡 Server-Sent Events: current status first, then every update via Redis Pub/Sub
+    One long-lived connection per job instead of repeated polling
+    """
+    
+    key = job_key(job_id)
+    pubsub = redis_client.pubsub()
+    
+    async def close_pubsub():
         try:
-            job_json = await redis_client.get(f"job:{job_id}")
-            if job_json:
-                job_data = json.loads(job_json)
-            else:
-                raise HTTPException(status_code=404, detail="Job not found")
-        except Exception as e:
+            await pubsub.unsubscribe()
+        finally:
+            await pubsub.aclose()
+    
+    try:
+        # Subscribe before the snapshot so no update in between gets lost
+        await pubsub.subscribe(key)
+        job_data = await redis_client.hgetall(key)
+        if not job_data:
             raise HTTPException(status_code=404, detail="Job not found")
-    else:
-        raise HTTPException(status_code=404, detail="Job not found")
+        snapshot = JobStatusResponse(**job_from_hash(job_data))
+    except BaseException:
+        # 404 oder Redis-Fehler vor dem Stream: dedizierte Pub/Sub-Connection nicht leaken
+        await close_pubsub()
+        raise
     
-    return JobStatusResponse(**job_data)
+    async def event_stream():
+        try:
+            yield f"data: {snapshot.model_dump_json()}\n\n"
+            if job_data["status"] in FINAL_JOB_STATUSES:
+                return
+            
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=SSE_KEEPALIVE_SECONDS
+                )
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+                
+                yield f"data: {message['data']}\n\n"
+                if orjson.loads(message["data"])["status"] in FINAL_JOB_STATUSES:
+                    return
+        finally:
+            await close_pubsub()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Index-Seite: nur die Spalten von ListingResponse laden (keine JSONB-Blobs, keine ORM-Objekte)
+LISTING_INDEX_COLUMNS = [getattr(Listing, name) for name in ListingResponse.model_fields]
 
 @app.get("/my-listings", response_model=List[ListingResponse])
 async def get_my_listings(
@@ -609,17 +979,20 @@ async def get_my_listings(
     📋 Get user's listings with pagination and filtering
     """
     
-    query = select(Listing).where(Listing.user_id == current_user.id)
+    # lambda_stmt: SQL-Kompilierung wird gecacht, Closure-Variablen werden Bind-Parameter
+    user_id = current_user.id
+    query = lambda_stmt(lambda: select(*LISTING_INDEX_COLUMNS).where(Listing.user_id == user_id))
     
     if status_filter:
-        query = query.where(Listing.status == status_filter)
+        query += lambda q: q.where(Listing.status == status_filter)
     
-    query = query.order_by(Listing.created_at.desc()).limit(limit).offset(offset)
+    query += lambda q: q.order_by(Listing.created_at.desc()).limit(limit).offset(offset)
     
+    # Gleiche Session wie get_current_user (Depends-Cache): eine Pool-Connection pro Request
     result = await db.execute(query)
-    listings = result.scalars().all()
+    rows = result.mappings().all()
     
-    return [ListingResponse.from_orm(listing) for listing in listings]
+    return [ListingResponse(**row) for row in rows]
 
 @app.get("/listing/{listing_id}")
 async def get_listing_details(
@@ -631,23 +1004,23 @@ async def get_listing_details(
     📄 Get detailed listing information
     """
     
-    result = await db.execute(
-        select(Listing).where(
+    # Listing + Processing Logs in einer Transaktion (selectinload statt zweitem Roundtrip),
+    # auf der Session von get_current_user statt einer zweiten Pool-Connection
+    user_id = current_user.id
+    result = await db.execute(lambda_stmt(
+        lambda: select(Listing)
+        .options(selectinload(Listing.processing_logs))
+        .where(
             Listing.id == listing_id,
-            Listing.user_id == current_user.id
+            Listing.user_id == user_id
         )
-    )
+    ))
     listing = result.scalar_one_or_none()
     
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
     
-    # Get processing logs
-    logs_result = await db.execute(
-        select(ProcessingLog).where(ProcessingLog.listing_id == listing_id)
-        .order_by(ProcessingLog.started_at)
-    )
-    processing_logs = logs_result.scalars().all()
+    processing_logs = sorted(listing.processing_logs, key=lambda log: log.started_at)
     
     return {
         "listing": ListingResponse.from_orm(listing),
@@ -671,12 +1044,13 @@ async def generate_listing_content(
         market_insights = EbayMarketInsights(**request.market_insights)
         
         # Generate content
-        listing_content = await content_service.generate_listing_content(
-            vision_result, market_insights, request.user_preferences
-        )
+        async with GPT_SEM:
+            listing_content = await content_service.generate_listing_content(
+                vision_result, market_insights, request.user_preferences
+            )
         
         # Optimize content
-        optimization = await content_service.optimize_content(listing_content)
+        optimization = await optimize_content_limited(listing_content)
         
         # Estimate performance
         estimated_performance = {
@@ -698,6 +1072,12 @@ async def generate_listing_content(
         logger.error(f"Content generation failed: {e}")
         raise HTTPException(status_code=500, detail="Content generation failed")
 
+# Dialekt-spezifische INSERTs mit on_conflict_do_nothing()
+ON_CONFLICT_INSERTS = {
+    "postgresql": pg_insert,
+    "sqlite": sqlite_insert
+}
+
 @app.get("/analytics/dashboard")
 async def get_user_analytics(
     current_user: User = Depends(get_current_user),
@@ -707,14 +1087,29 @@ async def get_user_analytics(
     📈 Get user analytics and performance metrics
     """
     
-    # Get user analytics
-    result = await db.execute(
-        select(UserAnalytics).where(UserAnalytics.user_id == current_user.id)
-    )
-    analytics = result.scalar_one_or_none()
+    # Get-or-create in einem Statement (race-frei bei parallelen Requests),
+    # sofern der Dialekt ON CONFLICT kann (PostgreSQL in Prod, SQLite im Dev-Setup)
+    analytics = None
+    dialect_insert = ON_CONFLICT_INSERTS.get(db.bind.dialect.name)
+    if dialect_insert is not None:
+        result = await db.execute(
+            dialect_insert(UserAnalytics)
+            .values(user_id=current_user.id)
+            .on_conflict_do_nothing(index_elements=[UserAnalytics.user_id])
+            .returning(UserAnalytics)
+        )
+        analytics = result.scalar_one_or_none()
+        if analytics is not None:
+            await db.commit()
+    
+    if analytics is None:
+        # Row existed already (oder Dialekt ohne ON CONFLICT) → SELECT
+        result = await db.execute(
+            select(UserAnalytics).where(UserAnalytics.user_id == current_user.id)
+        )
+        analytics = result.scalar_one_or_none()
     
-    if not analytics:
-        # Create empty analytics if none exist
+    if analytics is None:
         analytics = UserAnalytics(user_id=current_user.id)
         db.add(analytics)
         await db.commit()
@@ -726,16 +1121,14 @@ async def get_user_analytics(
     )
     recent_listings = recent_listings_result.scalars().all()
     
-    # Get API usage stats
-    api_usage_result = await db.execute(
-        select(APIUsageLog).where(
+    # Get API usage stats (SUM in Postgres statt 30 Tage Rows zu laden)
+    api_cost_result = await db.execute(
+        select(func.coalesce(func.sum(APIUsageLog.cost_cents), 0)).where(
             APIUsageLog.user_id == current_user.id,
-            APIUsageLog.created_at >= datetime.utcnow() - timedelta(days=30)
+            APIUsageLog.created_at >= utc_now() - timedelta(days=30)
         )
     )
-    api_usage = api_usage_result.scalars().all()
-    
-    total_api_cost = sum(log.cost_cents for log in api_usage)
+    total_api_cost = api_cost_result.scalar_one()
     
     return {
         "analytics": analytics,
@@ -756,12 +1149,12 @@ async def get_user_analytics(
 async def http_exception_handler(request, exc):
     """Custom HTTP exception handler"""
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": exc.detail,
             "status_code": exc.status_code,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utc_now().isoformat()
         }
     )
 
@@ -771,12 +1164,12 @@ async def global_exception_handler(request, exc):
     
     logger.error(f"Unhandled exception: {exc}")
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "Internal server error",
             "status_code": 500,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utc_now().isoformat()
         }
     )
 
@@ -787,13 +1180,25 @@ async def global_exception_handler(request, exc):
 if __name__ == "__main__":
     import uvicorn
     
-    uvicorn.run(
-        "main_complete:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True if os.getenv("DEBUG") == "1" else False,
-        log_level="info"
-    )
+    if os.getenv("DEBUG") == "1":
+        uvicorn.run(
+            "main_complete:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+            log_level="info"
+        )
+    else:
+        # Job-State liegt in Redis → mehrere Worker sind unbedenklich
+        uvicorn.run(
+            "main_complete:app",
+            host="0.0.0.0",
+            port=8000,
+            loop="uvloop",
+            http="httptools",
+            workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+            log_level="info"
+        )
 
 # ================================
 # Usage Examples & Documentation
@@ -827,6 +1232,8 @@ API ENDPOINTS:
 2. Job Status:
    GET /job-status/{job_id}
    - Returns: processing status and results
+   GET /job-status/{job_id}/stream
+   - Server-Sent Events: pushes every status update (no polling)
 
 3. User Listings:
    GET /my-listings
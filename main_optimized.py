@@ -5,16 +5,23 @@ Ultra-Fast, Production-Ready FastAPI Backend
 
 import os
 import asyncio
+import hashlib
+import re
 import uuid
 import logging
+import zlib
 from contextlib import asynccontextmanager
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Dict, Optional, Any
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, ORJSONResponse
+from sqlalchemy import Text, cast, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from jinja2 import DictLoader, Environment
+import orjson
 import uvicorn
 
 # Services Import
@@ -22,6 +29,10 @@ from services.vision_service import create_vision_service, VisionAnalysisResult
 from services.ebay_service import create_ebay_service, EbayMarketInsights
 from services.content_service import create_content_service, ListingContent
 
+# Bildvorverarbeitung
+from image_prep import decode_and_resize, probe_image
+from PIL import Image, UnidentifiedImageError
+
 # Database Setup
 from database.connection import get_db, init_db, close_db
 from database.models import Job, Listing
@@ -31,6 +42,13 @@ from cache.redis_manager import cache
 # 🔧 PERFORMANCE OPTIMIZATIONS
 # ========================================
 
+def utc_now() -> datetime:
+    """
+    Naive UTC wie bisher (die Job-Spalten bekommen weiterhin naive Werte),
+    aber ohne das in 3.12 deprecatete datetime.utcnow()
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 # Logging Setup für Production
 logging.basicConfig(
     level=logging.INFO,
@@ -88,8 +106,10 @@ async def lifespan(app: FastAPI):
         logger.error(f"❌ Database initialization failed: {e}")
     
     # Redis Connection Test
+    job_events_listener = None
     try:
         await cache.connect()
+        job_events_listener = asyncio.create_task(listen_job_events())
         logger.info("✅ Redis cache connected")
     except Exception as e:
         logger.warning(f"⚠️ Redis connection failed: {e}")
@@ -104,6 +124,9 @@ async def lifespan(app: FastAPI):
     # 🔄 SHUTDOWN
     logger.info("🔄 Graceful shutdown initiated...")
     
+    if job_events_listener:
+        job_events_listener.cancel()
+    
     try:
         await cache.close()
         await close_db()
@@ -128,6 +151,7 @@ app = FastAPI(
     """,
     version="2.0.0-OPTIMIZED",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/api/docs",
     redoc_url="/api/redoc"
 )
@@ -141,14 +165,199 @@ app.add_middleware(
         "https://ebay-automation.vercel.app"  # Production Frontend
     ],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"]
+    # Explizite Listen: Preflight-Header werden einmal vorberechnet statt pro Request gespiegelt
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "If-None-Match"],
+    max_age=86400  # Browser cachen den Preflight 24h
 )
 
+# ========================================
+# 📡 LIVE JOB UPDATES (SSE)
+# ========================================
+
+# Eine Queue pro offenem /api/events-Stream; nur Jobs mit aktiven Clients stehen hier drin
+JOB_CHANNELS: Dict[str, set[asyncio.Queue]] = {}
+SSE_KEEPALIVE_SECONDS = 15
+
+# Pipeline und SSE-Stream laufen bei mehreren Workern oft in verschiedenen Prozessen
+# → Updates gehen über Redis Pub/Sub, ein Listener pro Worker verteilt sie lokal
+JOB_EVENTS_PATTERN = "job-events:*"
+
+def job_events_channel(job_id: str) -> str:
+    return f"job-events:{job_id}"
+
+def deliver_job_event(job_id: str, payload: Dict[str, Any]):
+    """Update an alle offenen Streams des Jobs in diesem Worker pushen (kein DB-Read pro Client)"""
+    for queue in JOB_CHANNELS.get(job_id, ()):
+        queue.put_nowait(payload)
+
+async def publish_job_event(job_id: str, payload: Dict[str, Any]):
+    """An alle Worker veröffentlichen; ohne Redis nur an die lokalen Streams"""
+    try:
+        await cache.client.publish(job_events_channel(job_id), orjson.dumps(payload))
+    except Exception as e:
+        logger.warning(f"⚠️ Job event publish failed, delivering locally: {e}")
+        deliver_job_event(job_id, payload)
+
+async def listen_job_events():
+    """Ein Pattern-Subscriber pro Worker statt einer Subscription pro Stream"""
+    pubsub = cache.client.pubsub()
+    try:
+        await pubsub.psubscribe(JOB_EVENTS_PATTERN)
+        async for message in pubsub.listen():
+            if message["type"] != "pmessage":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            deliver_job_event(channel.split(":", 1)[1], orjson.loads(message["data"]))
+        logger.warning("⚠️ Job event listener ended; SSE streams fall back to DB checks")
+    except Exception:
+        logger.exception("❌ Job event listener stopped; SSE streams fall back to DB checks")
+    finally:
+        await pubsub.aclose()
+
+def is_final_job_event(payload: Dict[str, Any]) -> bool:
+    return payload["status"] == "error" or payload.get("completed_at") is not None
+
+def job_event_payload(job_id: str, job: Any) -> Dict[str, Any]:
+    """SSE-Payload aus einem Job (ORM-Objekt oder Row mit denselben Spalten)"""
+    return {
+        "job_id": job_id,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None
+    }
+
+async def load_job_event(job_id: str) -> Optional[Dict[str, Any]]:
+    """Aktuellen Stand kurz aus der DB lesen (None = Job existiert nicht mehr)"""
+    async with job_session() as db:
+        row = (await db.execute(
+            select(Job.status, Job.progress, Job.message, Job.completed_at).where(Job.id == job_id)
+        )).one_or_none()
+    return job_event_payload(job_id, row) if row is not None else None
+
+# Zwischenfortschritt innerhalb einer Phase lebt nur kurz in Redis (kein DB-Commit)
+JOB_PROGRESS_TTL_SECONDS = 30
+
+def job_progress_key(job_id: str) -> str:
+    return f"job:{job_id}:progress"
+
+async def store_job_progress(job_id: str, payload: Dict[str, Any]):
+    try:
+        await cache.client.setex(job_progress_key(job_id), JOB_PROGRESS_TTL_SECONDS, orjson.dumps(payload))
+    except Exception as e:
+        logger.warning(f"⚠️ Progress cache write failed: {e}")
+
+async def load_job_progress(job_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        cached = await cache.client.get(job_progress_key(job_id))
+        return orjson.loads(cached) if cached else None
+    except Exception as e:
+        logger.warning(f"⚠️ Progress cache read failed: {e}")
+        return None
+
+# ========================================
+# ♻️ LISTING BUNDLE CACHE (Duplikat-Produkte)
+# ========================================
+
+# Viele Verkäufer listen dasselbe Produkt mehrfach (neu fotografiert).
+# Key = normalisierte Produktidentität aus der Vision-Analyse + Präferenzen.
+LISTING_BUNDLE_TTL_SECONDS = 24 * 3600
+
+def listing_bundle_key(product: Any, user_preferences: Optional[Dict]) -> str:
+    identity = f"{product.brand or ''}|{product.name}|{product.condition}".lower()
+    fingerprint = " ".join(identity.split()).encode() + orjson.dumps(
+        user_preferences or {}, option=orjson.OPT_SORT_KEYS
+    )
+    return f"listing_bundle:{hashlib.blake2b(fingerprint, digest_size=16).hexdigest()}"
+
+async def load_listing_bundle(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        cached = await cache.client.get(key)
+        return orjson.loads(cached) if cached else None
+    except Exception as e:
+        logger.warning(f"⚠️ Listing cache read failed: {e}")
+        return None
+
+async def store_listing_bundle(key: str, bundle: Dict[str, Any]):
+    try:
+        await cache.client.setex(key, LISTING_BUNDLE_TTL_SECONDS, orjson.dumps(bundle, default=str))
+    except Exception as e:
+        logger.warning(f"⚠️ Listing cache write failed: {e}")
+
 # ========================================
 # 🎯 CORE PROCESSING PIPELINE
 # ========================================
 
+# Eigene Sessions für Hintergrund-Jobs: derselbe Session-Factory-Pfad wie get_db,
+# aber unabhängig vom Request-Lifecycle und nur pro Phasen-Commit geöffnet
+job_session = asynccontextmanager(get_db)
+
+# Gleiche Suchanfrage → gleiche Marktdaten; viele Nutzer listen dasselbe Produkt
+MARKET_CACHE_TTL_SECONDS = 3600
+MARKET_QUERY_STOPWORDS = frozenset({
+    "the", "and", "with", "for", "of", "der", "die", "das", "und", "mit", "für", "von"
+})
+MARKET_QUERY_PUNCT_RE = re.compile(r"[^\w\s]")
+
+def normalize_market_query(query: str) -> str:
+    """Kleinschreibung, ohne Satzzeichen/Stopwords, Tokens sortiert ("iPhone 13 Pro" == "pro iphone 13")"""
+    tokens = MARKET_QUERY_PUNCT_RE.sub(" ", query.lower()).split()
+    return " ".join(sorted({t for t in tokens if t not in MARKET_QUERY_STOPWORDS}))
+
+def market_cache_key(query: str) -> str:
+    digest = hashlib.blake2b(normalize_market_query(query).encode(), digest_size=16).hexdigest()
+    return f"ebay:{digest}"
+
+async def analyze_market_cached(query: str) -> EbayMarketInsights:
+    """eBay-Marktanalyse mit Redis-Cache (Cache-Fehler = Miss, nur echte Ergebnisse werden gecacht)"""
+    key = market_cache_key(query)
+    try:
+        cached = await cache.client.get(key)
+        if cached:
+            return EbayMarketInsights.model_validate_json(cached)
+    except Exception as e:
+        logger.warning(f"⚠️ Market cache read failed: {e}")
+    
+    insights = await services.ebay_service.analyze_market_prices(query, None)
+    
+    try:
+        await cache.client.setex(key, MARKET_CACHE_TTL_SECONDS, insights.model_dump_json())
+    except Exception as e:
+        logger.warning(f"⚠️ Market cache write failed: {e}")
+    return insights
+
+async def first_market_insights(market_calls) -> Optional[EbayMarketInsights]:
+    """Erstes erfolgreiches Ergebnis zurückgeben und die langsameren Suchen abbrechen"""
+    tasks = [asyncio.ensure_future(call) for call in market_calls]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                result = await next_done
+            except Exception as e:
+                logger.warning(f"⚠️ Market query failed: {e}")
+                continue
+            if isinstance(result, EbayMarketInsights):
+                return result
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def gather_settled(*aws):
+    """
+    Wie asyncio.gather, aber alle Awaitables laufen zu Ende bevor der erste Fehler
+    weitergereicht wird - kein Phasen-Commit läuft mehr, wenn der Fehler-Handler
+    den Job danach auf "error" setzt
+    """
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for outcome in results:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    return results
+
 class ProcessingPipeline:
     """Ultra-High Performance Processing Pipeline"""
     
@@ -156,7 +365,6 @@ class ProcessingPipeline:
     async def process_product_complete(
         job_id: str, 
         image_data: bytes, 
-        db: AsyncSession,
         user_preferences: Optional[Dict] = None
     ) -> Dict[str, Any]:
         """
@@ -164,128 +372,172 @@ class ProcessingPipeline:
         Performance: < 15 Sekunden für kompletten Workflow
         """
         
-        logger.info(f"🚀 Starting pipeline for job {job_id}")
+        logger.info("🚀 Starting pipeline for job %s", job_id)
         
         try:
             # Job Status Update Helper
-            async def update_progress(status: str, progress: int, message: str = ""):
-                job = await db.get(Job, job_id)
-                if job:
-                    job.status = status
-                    job.progress = progress
-                    if message:
-                        job.message = message
-                    await db.commit()
-                logger.info(f"📊 Job {job_id}: {progress}% - {message or status}")
+            # persist=True nur an Phasengrenzen; Zwischenstände gehen an Redis + SSE (kein Commit)
+            async def update_progress(status: str, progress: int, message: str = "", *, persist: bool = False):
+                payload = {
+                    "job_id": job_id,
+                    "status": status,
+                    "progress": progress,
+                    "message": message or None
+                }
+                if persist:
+                    # Kurzlebige Session nur für diesen Commit (nie über externe API-Calls gehalten)
+                    async with job_session() as db:
+                        job = await db.get(Job, job_id)
+                        if job:
+                            job.status = status
+                            job.progress = progress
+                            if message:
+                                job.message = message
+                            payload["message"] = job.message
+                            await db.commit()
+                else:
+                    await store_job_progress(job_id, payload)
+                await publish_job_event(job_id, payload)
+                logger.info("📊 Job %s: %d%% - %s", job_id, progress, message or status)
             
-            # PHASE 1: VISION ANALYSIS (Parallel Image Optimization)
-            await update_progress("analyzing", 10, "KI analysiert Produktbild...")
+            async def run_vision():
+                # Decode + Downscale in einem Durchlauf, außerhalb des Event Loops
+                vision_image = await asyncio.to_thread(decode_and_resize, image_data)
+                return await services.vision_service.analyze_product_image(vision_image)
             
-            vision_result = await services.vision_service.analyze_product_image(image_data)
+            # PHASE 1: VISION ANALYSIS (Phasen-Commit überlappt mit dem Vision-Call)
+            _, vision_result = await gather_settled(
+                update_progress("analyzing", 10, "KI analysiert Produktbild...", persist=True),
+                run_vision()
+            )
             
             await update_progress("analyzing", 30, f"Produkt erkannt: {vision_result.product.name}")
             
-            # PHASE 2: MARKET RESEARCH (Concurrent API Calls) 
-            await update_progress("researching", 40, "Marktpreise werden analysiert...")
-            
-            # Parallel Market Analysis
-            market_tasks = []
+            # Bereits bekanntes Produkt (gleiche Marke/Name/Zustand + Präferenzen)?
+            # → Marktanalyse und Content-Generierung komplett überspringen
+            bundle_key = listing_bundle_key(vision_result.product, user_preferences)
+            listing_bundle = await load_listing_bundle(bundle_key)
             
-            # Hauptprodukt-Analyse
-            main_market_task = services.ebay_service.analyze_market_prices(
-                vision_result.product.name,
-                None  # Auto-detect category
-            )
-            market_tasks.append(main_market_task)
-            
-            # Alternative Suchbegriffe für bessere Datenqualität
-            if vision_result.product.brand:
-                brand_market_task = services.ebay_service.analyze_market_prices(
-                    f"{vision_result.product.brand} {vision_result.product.name.split()[0]}",
-                    None
+            if listing_bundle:
+                await update_progress("generating", 90, "Bekanntes Produkt: Marktdaten und Text aus dem Cache")
+            else:
+                # PHASE 2: MARKET RESEARCH (Concurrent API Calls) 
+                # Parallel Market Analysis
+                market_tasks = []
+                
+                # Hauptprodukt-Analyse
+                main_market_task = analyze_market_cached(
+                    vision_result.product.name  # Kategorie: Auto-detect
                 )
-                market_tasks.append(brand_market_task)
-            
-            # Parallel Execution für Maximum Speed
-            market_results = await asyncio.gather(*market_tasks, return_exceptions=True)
-            
-            # Bestes Markt-Ergebnis auswählen
-            market_insights = None
-            for result in market_results:
-                if isinstance(result, EbayMarketInsights):
-                    market_insights = result
-                    break
-            
-            if not market_insights:
-                # Fallback falls alle Marktanalysen fehlschlagen
-                logger.warning("Market analysis failed, using fallback data")
-                from services.ebay_service import MockEbayService
-                mock_service = MockEbayService()
-                market_insights = await mock_service.analyze_market_prices(vision_result.product.name)
-            
-            await update_progress("researching", 60, f"Marktdaten gefunden: Ø{market_insights.price_data.average_price/100:.2f}€")
-            
-            # PHASE 3: CONTENT GENERATION (Optimized Prompting)
-            await update_progress("generating", 70, "Verkaufstext wird generiert...")
-            
-            listing_content = await services.content_service.generate_listing_content(
-                vision_result,
-                market_insights,
-                user_preferences or {}
-            )
-            
-            await update_progress("generating", 90, "Content-Optimierung läuft...")
-            
-            # PHASE 4: FINALIZATION
-            await update_progress("ready", 100, "Listing ist bereit zum Veröffentlichen!")
-            
+                market_tasks.append(main_market_task)
+                
+                # Alternative Suchbegriffe für bessere Datenqualität
+                if vision_result.product.brand:
+                    brand_market_task = analyze_market_cached(
+                        f"{vision_result.product.brand} {vision_result.product.name.split()[0]}"
+                    )
+                    market_tasks.append(brand_market_task)
+                
+                # Parallel Execution für Maximum Speed (inkl. Phasen-Commit);
+                # das erste gültige Markt-Ergebnis gewinnt
+                _, market_insights = await gather_settled(
+                    update_progress("researching", 40, "Marktpreise werden analysiert...", persist=True),
+                    first_market_insights(market_tasks)
+                )
+                
+                market_is_fallback = market_insights is None
+                if market_is_fallback:
+                    # Fallback falls alle Marktanalysen fehlschlagen
+                    logger.warning("Market analysis failed, using fallback data")
+                    from services.ebay_service import MockEbayService
+                    mock_service = MockEbayService()
+                    market_insights = await mock_service.analyze_market_prices(vision_result.product.name)
+                
+                await update_progress("researching", 60, f"Marktdaten gefunden: Ø{market_insights.price_data.average_price/100:.2f}€")
+                
+                # PHASE 3: CONTENT GENERATION (Optimized Prompting)
+                _, listing_content = await gather_settled(
+                    update_progress("generating", 70, "Verkaufstext wird generiert...", persist=True),
+                    services.content_service.generate_listing_content(
+                        vision_result,
+                        market_insights,
+                        user_preferences or {}
+                    )
+                )
+                
+                await update_progress("generating", 90, "Content-Optimierung läuft...")
+                
+                # Markt + Content für dieses Produkt (wird zwischen Jobs wiederverwendet)
+                listing_bundle = {
+                    "market_analysis": {
+                        "price_data": market_insights.price_data.model_dump(mode="json"),
+                        "competition_level": market_insights.competition_level,
+                        "success_probability": market_insights.success_probability,
+                        "popular_keywords": market_insights.popular_keywords
+                    },
+                    "listing_content": {
+                        "title": listing_content.title,
+                        "description": listing_content.description,
+                        "bullet_points": listing_content.bullet_points,
+                        "seo_keywords": listing_content.seo_keywords,
+                        "condition_description": listing_content.condition_description,
+                        "shipping_description": listing_content.shipping_description
+                    },
+                    "recommendations": {
+                        "starting_price": market_insights.price_data.competitive_price,
+                        "optimal_timing": "Wochenende oder Abend für höchste Sichtbarkeit",
+                        "category_suggestions": vision_result.category_suggestions[:3]
+                    }
+                }
+                # Mock-Fallback-Daten nicht für 24h an andere Jobs weitergeben
+                if not market_is_fallback:
+                    await store_listing_bundle(bundle_key, listing_bundle)
+                
+            # PHASE 4: FINALIZATION (Status "ready" wird zusammen mit dem Ergebnis committed)
             # Complete Result Package
             result = {
                 "status": "success",
                 "job_id": job_id,
                 "product_analysis": {
-                    "product": vision_result.product.dict(),
+                    "product": vision_result.product.model_dump(mode="json"),
                     "confidence_score": vision_result.confidence_score,
                     "suggested_keywords": vision_result.suggested_keywords,
                     "estimated_value_range": vision_result.estimated_value_range,
                     "marketing_highlights": vision_result.marketing_highlights
                 },
-                "market_analysis": {
-                    "price_data": market_insights.price_data.dict(),
-                    "competition_level": market_insights.competition_level,
-                    "success_probability": market_insights.success_probability,
-                    "popular_keywords": market_insights.popular_keywords
-                },
-                "listing_content": {
-                    "title": listing_content.title,
-                    "description": listing_content.description,
-                    "bullet_points": listing_content.bullet_points,
-                    "seo_keywords": listing_content.seo_keywords,
-                    "condition_description": listing_content.condition_description,
-                    "shipping_description": listing_content.shipping_description
-                },
-                "recommendations": {
-                    "starting_price": market_insights.price_data.competitive_price,
-                    "optimal_timing": "Wochenende oder Abend für höchste Sichtbarkeit",
-                    "category_suggestions": vision_result.category_suggestions[:3]
-                }
+                **listing_bundle
             }
             
             # Final Job Update
-            job = await db.get(Job, job_id)
-            if job:
-                job.result = result
-                job.completed_at = datetime.utcnow()
-                await db.commit()
+            final_event = {
+                "job_id": job_id,
+                "status": "ready",
+                "progress": 100,
+                "message": "Listing ist bereit zum Veröffentlichen!",
+                "completed_at": utc_now()
+            }
+            async with job_session() as db:
+                job = await db.get(Job, job_id)
+                if job:
+                    job.status = final_event["status"]
+                    job.progress = final_event["progress"]
+                    job.message = final_event["message"]
+                    job.result = result
+                    job.completed_at = final_event["completed_at"]
+                    await db.commit()
+                    await publish_job_event(job_id, {
+                        **final_event,
+                        "completed_at": final_event["completed_at"].isoformat()
+                    })
             
-            logger.info(f"✅ Pipeline completed successfully for job {job_id}")
+            logger.info("✅ Pipeline completed successfully for job %s", job_id)
             return result
             
         except Exception as e:
             logger.error(f"❌ Pipeline failed for job {job_id}: {e}")
             
             # Error Job Update
-            await update_progress("error", 0, f"Fehler: {str(e)}")
+            await update_progress("error", 0, f"Fehler: {str(e)}", persist=True)
             
             raise HTTPException(
                 status_code=500,
@@ -313,10 +565,14 @@ async def root():
             "docs": "/api/docs",
             "analyze": "/api/analyze-product",
             "status": "/api/status/{job_id}",
+            "events": "/api/events/{job_id}",
             "preview": "/api/preview/{job_id}"
         }
     }
 
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB Limit
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
 @app.post("/api/analyze-product")
 async def analyze_product(
     background_tasks: BackgroundTasks,
@@ -337,10 +593,25 @@ async def analyze_product(
             detail="File must be an image (JPG, PNG, WebP)"
         )
     
-    if file.size > 10 * 1024 * 1024:  # 10MB Limit
+    # Read Image Data in Chunks (file.size ist bei chunked Uploads None);
+    # Abbruch sobald das Limit überschritten ist, noch bevor ein Job angelegt wird
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buffer.extend(chunk)
+        if len(buffer) > MAX_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail="Image size must be less than 10MB"
+            )
+    image_data = bytes(buffer)
+    
+    # Header-Peek: kaputte/falsch deklarierte Dateien abweisen, bevor ein Job entsteht
+    try:
+        probe_image(image_data)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
         raise HTTPException(
             status_code=400,
-            detail="Image size must be less than 10MB"
+            detail="File must be an image (JPG, PNG, WebP)"
         )
     
     try:
@@ -352,29 +623,27 @@ async def analyze_product(
             id=job_id,
             status="queued",
             progress=0,
-            created_at=datetime.utcnow()
+            created_at=utc_now()
         )
         db.add(job)
         await db.commit()
         
-        # Read Image Data
-        image_data = await file.read()
-        
         # Start Background Processing
+        # Ohne Request-Session: die ist nach der Response geschlossen
         background_tasks.add_task(
             ProcessingPipeline.process_product_complete,
             job_id,
-            image_data,
-            db
+            image_data
         )
         
-        logger.info(f"🚀 Job {job_id} queued for processing")
+        logger.info("🚀 Job %s queued for processing", job_id)
         
         return {
             "success": True,
             "job_id": job_id,
             "message": "Analyse gestartet! 🚀",
             "status_url": f"/api/status/{job_id}",
+            "events_url": f"/api/events/{job_id}",
             "preview_url": f"/api/preview/{job_id}",
             "estimated_completion": "15 Sekunden"
         }
@@ -386,29 +655,64 @@ async def analyze_product(
             detail=f"Failed to start analysis: {str(e)}"
         )
 
+def job_etag(status: str, progress: int, completed_at: Optional[datetime]) -> str:
+    """Ändert sich nur, wenn sich Status/Fortschritt ändern"""
+    fingerprint = f"{status}:{progress}:{completed_at}".encode()
+    return f'"{hashlib.blake2b(fingerprint, digest_size=8).hexdigest()}"'
+
 @app.get("/api/status/{job_id}")
-async def get_job_status(job_id: str, db: AsyncSession = Depends(get_db)):
+async def get_job_status(
+    job_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
     """
     📊 Job Status Polling (Optimized für Real-time Updates)
+    ETag + If-None-Match: unveränderte Polls bekommen ein leeres 304
     """
     
-    job = await db.get(Job, job_id)
+    # Große JSON-Spalte (result) nicht bei jedem Poll mitladen
+    job = await db.scalar(
+        select(Job)
+        .options(load_only(
+            Job.status, Job.progress, Job.message, Job.error,
+            Job.created_at, Job.completed_at
+        ))
+        .where(Job.id == job_id)
+    )
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    response = {
+    progress, message = job.progress, job.message
+    if job.status not in ("ready", "error"):
+        # Zwischenstand der laufenden Phase (wird nicht committed)
+        live = await load_job_progress(job_id)
+        if live and live["status"] == job.status and live["progress"] > progress:
+            progress, message = live["progress"], live["message"] or message
+    
+    etag = job_etag(job.status, progress, job.completed_at)
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    
+    payload = {
         "job_id": job_id,
         "status": job.status,
-        "progress": job.progress,
-        "message": job.message,
+        "progress": progress,
+        "message": message,
         "created_at": job.created_at.isoformat(),
         "completed_at": job.completed_at.isoformat() if job.completed_at else None
     }
     
-    # Add result if completed
-    if job.status == "ready" and job.result:
-        response["result"] = job.result
-        response["actions"] = {
+    # Add result if completed (erst jetzt die result-Spalte laden).
+    # Als JSON-Text aus der DB und per orjson.Fragment unverändert eingebettet:
+    # kein Decode in dicts, kein jsonable_encoder, kein zweites Encode
+    result_json = None
+    if job.status == "ready":
+        result_json = await db.scalar(select(cast(Job.result, Text)).where(Job.id == job_id))
+    if result_json and result_json != "null":
+        payload["result"] = orjson.Fragment(result_json)
+        payload["actions"] = {
             "preview": f"/api/preview/{job_id}",
             "publish": f"/api/publish/{job_id}",
             "download": f"/api/download/{job_id}"
@@ -416,154 +720,275 @@ async def get_job_status(job_id: str, db: AsyncSession = Depends(get_db)):
     
     # Add error details if failed
     if job.status == "error":
-        response["error"] = job.error
-        response["retry_url"] = f"/api/retry/{job_id}"
+        payload["error"] = job.error
+        payload["retry_url"] = f"/api/retry/{job_id}"
     
-    return response
+    # Response direkt zurückgeben → FastAPI überspringt jsonable_encoder
+    return ORJSONResponse(payload, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/api/events/{job_id}")
+async def stream_job_events(job_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    📡 Server-Sent Events statt Polling: aktueller Stand, danach jedes Update live
+    Stream endet, sobald das Ergebnis gespeichert ist oder ein Fehler auftritt
+    """
+    
+    # Queue vor dem Snapshot registrieren, damit kein Update verloren geht
+    queue: asyncio.Queue = asyncio.Queue()
+    JOB_CHANNELS.setdefault(job_id, set()).add(queue)
+    
+    def unsubscribe():
+        queues = JOB_CHANNELS.get(job_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del JOB_CHANNELS[job_id]
+    
+    try:
+        job = await db.get(Job, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        snapshot = job_event_payload(job_id, job)
+    except BaseException:
+        unsubscribe()
+        raise
+    finally:
+        # Connection nicht für die gesamte Stream-Dauer halten
+        await db.close()
+    
+    async def event_generator():
+        try:
+            payload = snapshot
+            while True:
+                yield b"data: " + orjson.dumps(payload) + b"\n\n"
+                if is_final_job_event(payload):
+                    return
+                
+                while True:
+                    try:
+                        payload = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                        break
+                    except asyncio.TimeoutError:
+                        # Listener tot oder Pipeline-Worker abgestürzt → Stand selbst prüfen,
+                        # statt endlos Keepalives zu senden
+                        current = await load_job_event(job_id)
+                        if current is None:
+                            return
+                        if is_final_job_event(current):
+                            payload = current
+                            break
+                        yield b": keepalive\n\n"
+        finally:
+            unsubscribe()
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ========================================
+# 👀 PREVIEW RENDERING
+# ========================================
+
+# Statischer Kopf (Meta + CSS) ändert sich nie → einmal encodiert und vorkomprimiert.
+# Der <title> steht deshalb erst nach dem <style>-Block im dynamischen Teil.
+PREVIEW_HEAD_HTML = """<!DOCTYPE html>
+<html lang="de">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <style>
+        body { 
+            font-family: 'Helvetica Neue', Arial, sans-serif; 
+            line-height: 1.6; 
+            margin: 0; 
+            padding: 20px; 
+            background: #f5f5f5;
+        }
+        .container { 
+            max-width: 800px; 
+            margin: 0 auto; 
+            background: white; 
+            border-radius: 12px; 
+            box-shadow: 0 4px 20px rgba(0,0,0,0.1);
+            overflow: hidden;
+        }
+        .header { 
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white; 
+            padding: 30px;
+            text-align: center;
+        }
+        .content { padding: 30px; }
+        .price-box { 
+            background: #4CAF50; 
+            color: white; 
+            padding: 20px; 
+            border-radius: 8px; 
+            text-align: center; 
+            margin: 20px 0;
+        }
+        .features { 
+            display: grid; 
+            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); 
+            gap: 20px; 
+            margin: 30px 0;
+        }
+        .feature-card { 
+            background: #f8f9fa; 
+            padding: 20px; 
+            border-radius: 8px; 
+            border-left: 4px solid #007bff;
+        }
+        .badge { 
+            display: inline-block; 
+            background: #007bff; 
+            color: white; 
+            padding: 4px 12px; 
+            border-radius: 20px; 
+            font-size: 0.8em; 
+            margin: 2px;
+        }
+        @media (max-width: 768px) {
+            body { padding: 10px; }
+            .container { border-radius: 0; }
+            .header, .content { padding: 20px; }
+        }
+    </style>
+"""
+
+# Template wird einmal beim Import zu Python-Bytecode kompiliert (Mobile-First).
+# Die Beschreibung ist generiertes HTML und wird bewusst nicht escaped.
+PREVIEW_TEMPLATE_SOURCE = """    <title>eBay Preview: {{ listing.title }}</title>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>{{ listing.title }}</h1>
+            <p>🎯 Automatisch generierte eBay-Auktion</p>
+        </div>
+        
+        <div class="content">
+            <div class="price-box">
+                <h2>💰 Empfohlener Startpreis: {{ '%.2f'|format(market.competitive_price / 100) }}€</h2>
+                <p>Marktdurchschnitt: {{ '%.2f'|format(market.average_price / 100) }}€ | Preisspanne: {{ '%.2f'|format(market.min_price / 100) }}€ - {{ '%.2f'|format(market.max_price / 100) }}€</p>
+            </div>
+            
+            <div class="features">
+                <div class="feature-card">
+                    <h3>📋 Produktdetails</h3>
+                    <p><strong>Marke:</strong> {{ product.brand or 'Siehe Beschreibung' }}</p>
+                    <p><strong>Zustand:</strong> {{ product.condition }}</p>
+                    <p><strong>Kategorie:</strong> {{ product.category }}</p>
+                </div>
+                
+                <div class="feature-card">
+                    <h3>📊 Marktdaten</h3>
+                    <p><strong>Verkaufte Items:</strong> {{ market.sold_count }}</p>
+                    <p><strong>Konkurrenz:</strong> {{ market.active_listings }} aktive Listings</p>
+                    <p><strong>Trend:</strong> {{ market.price_trend }}</p>
+                </div>
+            </div>
+            
+            <div style="margin: 30px 0;">
+                <h3>✨ SEO Keywords</h3>
+                {% for kw in listing.seo_keywords or [] %}<span class="badge">{{ kw }}</span> {% endfor %}
+            </div>
+            
+            <div style="border-top: 2px solid #eee; padding-top: 30px; margin-top: 30px;">
+                <h2>📝 Beschreibung</h2>
+                {{ listing.description|safe }}
+            </div>
+            
+            <div style="margin-top: 30px; padding: 20px; background: #e8f5e8; border-radius: 8px;">
+                <h3>🚀 Nächste Schritte</h3>
+                <p>✅ Beschreibung prüfen und bei Bedarf anpassen</p>
+                <p>✅ Startpreis festlegen ({{ '%.2f'|format(market.competitive_price / 100) }}€ empfohlen)</p>
+                <p>✅ Fotos hochladen (mindestens 3-5 Bilder)</p>
+                <p>✅ Auf eBay veröffentlichen</p>
+            </div>
+        </div>
+    </div>
+</body>
+</html>"""
+
+_jinja_env = Environment(
+    loader=DictLoader({"preview.html": PREVIEW_TEMPLATE_SOURCE}),
+    autoescape=True
+)
+PREVIEW_TEMPLATE = _jinja_env.get_template("preview.html")
+PREVIEW_CHUNK_SIZE = 64 * 1024
+
+# gzip-Zustand nach dem statischen Kopf einfrieren; pro Request nur noch
+# compressobj.copy() + den dynamischen Teil komprimieren (ein gültiger gzip-Stream)
+PREVIEW_HEAD_BYTES = PREVIEW_HEAD_HTML.encode("utf-8")
+_preview_head_compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+PREVIEW_HEAD_GZIP_PREFIX = _preview_head_compressor.compress(PREVIEW_HEAD_BYTES)
+
+def gzip_preview(dynamic_body: bytes) -> bytes:
+    compressor = _preview_head_compressor.copy()
+    return PREVIEW_HEAD_GZIP_PREFIX + compressor.compress(dynamic_body) + compressor.flush()
+
+def preview_etag(job_id: str, completed_at: Optional[datetime]) -> str:
+    fingerprint = f"preview:{job_id}:{completed_at}".encode()
+    return f'"{hashlib.blake2b(fingerprint, digest_size=8).hexdigest()}"'
+
+async def iter_html_chunks(body: bytes):
+    """Vorab encodiertes HTML in 64 KB Chunks streamen"""
+    for i in range(0, len(body), PREVIEW_CHUNK_SIZE):
+        yield body[i:i + PREVIEW_CHUNK_SIZE]
 
 @app.get("/api/preview/{job_id}")
-async def preview_listing(job_id: str, db: AsyncSession = Depends(get_db)):
+async def preview_listing(job_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     """
     👀 HTML Preview der generierten eBay-Auktion
     """
     
-    job = await db.get(Job, job_id)
+    job = await db.scalar(
+        select(Job).options(load_only(Job.status, Job.completed_at)).where(Job.id == job_id)
+    )
     if not job or job.status != "ready":
         raise HTTPException(
             status_code=404, 
             detail="Job not found or not ready"
         )
     
-    if not job.result:
+    # Ergebnis ändert sich nach completed_at nicht mehr → Browser bekommt 304
+    etag = preview_etag(job_id, job.completed_at)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    
+    result = await db.scalar(select(Job.result).where(Job.id == job_id))
+    if not result:
         raise HTTPException(status_code=500, detail="No result data available")
     
     try:
-        listing = job.result["listing_content"]
-        product = job.result["product_analysis"]["product"]
-        market = job.result["market_analysis"]["price_data"]
+        listing = result["listing_content"]
+        product = result["product_analysis"]["product"]
+        market = result["market_analysis"]["price_data"]
         
         # Optimized HTML Template (Mobile-First)
-        html_content = f"""
-        <!DOCTYPE html>
-        <html lang="de">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>eBay Preview: {listing['title']}</title>
-            <style>
-                body {{ 
-                    font-family: 'Helvetica Neue', Arial, sans-serif; 
-                    line-height: 1.6; 
-                    margin: 0; 
-                    padding: 20px; 
-                    background: #f5f5f5;
-                }}
-                .container {{ 
-                    max-width: 800px; 
-                    margin: 0 auto; 
-                    background: white; 
-                    border-radius: 12px; 
-                    box-shadow: 0 4px 20px rgba(0,0,0,0.1);
-                    overflow: hidden;
-                }}
-                .header {{ 
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white; 
-                    padding: 30px;
-                    text-align: center;
-                }}
-                .content {{ padding: 30px; }}
-                .price-box {{ 
-                    background: #4CAF50; 
-                    color: white; 
-                    padding: 20px; 
-                    border-radius: 8px; 
-                    text-align: center; 
-                    margin: 20px 0;
-                }}
-                .features {{ 
-                    display: grid; 
-                    grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); 
-                    gap: 20px; 
-                    margin: 30px 0;
-                }}
-                .feature-card {{ 
-                    background: #f8f9fa; 
-                    padding: 20px; 
-                    border-radius: 8px; 
-                    border-left: 4px solid #007bff;
-                }}
-                .badge {{ 
-                    display: inline-block; 
-                    background: #007bff; 
-                    color: white; 
-                    padding: 4px 12px; 
-                    border-radius: 20px; 
-                    font-size: 0.8em; 
-                    margin: 2px;
-                }}
-                @media (max-width: 768px) {{
-                    body {{ padding: 10px; }}
-                    .container {{ border-radius: 0; }}
-                    .header, .content {{ padding: 20px; }}
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>{listing['title']}</h1>
-                    <p>🎯 Automatisch generierte eBay-Auktion</p>
-                </div>
-                
-                <div class="content">
-                    <div class="price-box">
-                        <h2>💰 Empfohlener Startpreis: {market['competitive_price']/100:.2f}€</h2>
-                        <p>Marktdurchschnitt: {market['average_price']/100:.2f}€ | Preisspanne: {market['min_price']/100:.2f}€ - {market['max_price']/100:.2f}€</p>
-                    </div>
-                    
-                    <div class="features">
-                        <div class="feature-card">
-                            <h3>📋 Produktdetails</h3>
-                            <p><strong>Marke:</strong> {product['brand'] or 'Siehe Beschreibung'}</p>
-                            <p><strong>Zustand:</strong> {product['condition']}</p>
-                            <p><strong>Kategorie:</strong> {product['category']}</p>
-                        </div>
-                        
-                        <div class="feature-card">
-                            <h3>📊 Marktdaten</h3>
-                            <p><strong>Verkaufte Items:</strong> {market['sold_count']}</p>
-                            <p><strong>Konkurrenz:</strong> {market['active_listings']} aktive Listings</p>
-                            <p><strong>Trend:</strong> {market['price_trend']}</p>
-                        </div>
-                    </div>
-                    
-                    <div style="margin: 30px 0;">
-                        <h3>✨ SEO Keywords</h3>
-                        {' '.join([f'<span class="badge">{kw}</span>' for kw in listing.get('seo_keywords', [])])}
-                    </div>
-                    
-                    <div style="border-top: 2px solid #eee; padding-top: 30px; margin-top: 30px;">
-                        <h2>📝 Beschreibung</h2>
-                        {listing['description']}
-                    </div>
-                    
-                    <div style="margin-top: 30px; padding: 20px; background: #e8f5e8; border-radius: 8px;">
-                        <h3>🚀 Nächste Schritte</h3>
-                        <p>✅ Beschreibung prüfen und bei Bedarf anpassen</p>
-                        <p>✅ Startpreis festlegen ({market['competitive_price']/100:.2f}€ empfohlen)</p>
-                        <p>✅ Fotos hochladen (mindestens 3-5 Bilder)</p>
-                        <p>✅ Auf eBay veröffentlichen</p>
-                    </div>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        # Vorkompiliertes Template (Autoescaping für Titel, Keywords, Produktdaten)
+        dynamic_body = PREVIEW_TEMPLATE.render(listing=listing, product=product, market=market).encode("utf-8")
+        
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            return Response(
+                content=gzip_preview(dynamic_body),
+                media_type="text/html; charset=utf-8",
+                headers={**headers, "Content-Encoding": "gzip"}
+            )
+        
+        # Einmal encodieren; nur große Beschreibungen werden gechunkt gestreamt
+        body = PREVIEW_HEAD_BYTES + dynamic_body
+        if len(body) <= PREVIEW_CHUNK_SIZE:
+            return HTMLResponse(content=body, headers=headers)
         
         return StreamingResponse(
-            iter([html_content]), 
-            media_type="text/html"
+            iter_html_chunks(body),
+            media_type="text/html; charset=utf-8",
+            headers=headers
         )
         
     except Exception as e:
@@ -581,7 +1006,7 @@ async def health_check():
     
     health_status = {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": utc_now().isoformat(),
         "services": {}
     }
     
@@ -616,11 +1041,25 @@ if __name__ == "__main__":
     print("🚀 Starting eBay Automation API - OPTIMIZED VERSION")
     print("📊 Features: Ultra-fast processing, Real-time updates, Production-ready")
     
-    uvicorn.run(
-        "main_optimized:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info",
-        access_log=True
-    )
\ No newline at end of file
+    if os.getenv("ENV") == "prod":
+        # uvloop + httptools, ein Worker pro Core; Access-Logs übernimmt der Reverse Proxy
+        uvicorn.run(
+            "main_optimized:app",
+            host="0.0.0.0",
+            port=8000,
+            loop="uvloop",
+            http="httptools",
+            workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+            proxy_headers=True,
+            access_log=False,
+            log_level="warning"
+        )
+    else:
+        uvicorn.run(
+            "main_optimized:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+            log_level="info",
+            access_log=True
+        )
\ No newline at end of file
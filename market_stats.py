@@ -0,0 +1,47 @@
+"""
+📈 Marktstatistik - JIT-kompilierte Preis-Aggregation
+Numba-Kernel für Mittelwert, Median und Quartile über Konkurrenzpreise
+"""
+
+import numpy as np
+from numba import njit
+
+# Ab dieser Array-Größe läuft price_stats per asyncio.to_thread (nogil) statt im Event Loop
+OFFLOAD_THRESHOLD = 10_000
+
+@njit(cache=True, nogil=True)
+def _percentile_sorted(sorted_prices: np.ndarray, q: float) -> float:
+    """Lineare Interpolation auf einem bereits sortierten Array"""
+    pos = (sorted_prices.size - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, sorted_prices.size - 1)
+    frac = pos - lower
+    return sorted_prices[lower] + (sorted_prices[upper] - sorted_prices[lower]) * frac
+
+@njit(cache=True, nogil=True)
+def price_stats(prices: np.ndarray) -> tuple[float, float, float, float]:
+    """
+    Mittelwert (Welford, ein Durchlauf), Median, 25. und 75. Perzentil.
+    nogil=True: kann aus asyncio.to_thread laufen, ohne den Event Loop zu blockieren.
+    """
+    n = prices.size
+    if n == 0:
+        return 0.0, 0.0, 0.0, 0.0
+    
+    mean = 0.0
+    for i in range(n):
+        mean += (prices[i] - mean) / (i + 1)
+    
+    sorted_prices = np.sort(prices)
+    return (
+        mean,
+        _percentile_sorted(sorted_prices, 0.5),
+        _percentile_sorted(sorted_prices, 0.25),
+        _percentile_sorted(sorted_prices, 0.75)
+    )
+
+def warm_up() -> None:
+    """JIT-Compile (bzw. Laden aus dem Disk-Cache) beim Import statt beim ersten Request"""
+    price_stats(np.zeros(1, dtype=np.float64))
+
+warm_up()
@@ -0,0 +1,78 @@
+"""
+⚡ Redis Response Cache
+Content-Hash-Keys für externe API-Antworten (eBay Finding, OpenAI Vision)
+"""
+
+import functools
+import hashlib
+import os
+from typing import Any, Callable, Optional
+
+import orjson
+import redis.asyncio as redis
+
+_client: Optional[redis.Redis] = None
+
+def get_redis() -> redis.Redis:
+    """Lazy erstellter Redis Client für den Response Cache"""
+    global _client
+    if _client is None:
+        _client = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    return _client
+
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+
+def content_hash(*parts: Any) -> str:
+    """
+    Kompakter, stabiler Key aus JSON-serialisierbaren Argumenten (Dataclasses, Enums, ...).
+    Kanonisch (sortierte Keys) statt pickle: gleiche Eingaben → gleiche Bytes → gleicher Key
+    """
+    canonical = orjson.dumps(parts, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+def redis_cached(
+    ttl: int = 3600,
+    prefix: str = "cache",
+    key_builder: Optional[Callable[..., str]] = None,
+    decode: Optional[Callable[[Any], Any]] = None
+):
+    """
+    Cacht das Ergebnis einer async Methode in Redis (orjson-serialisiert).
+    `self` fließt nicht in den Key ein; None-Ergebnisse werden nicht gecacht.
+    Redis-Ausfälle und kaputte/veraltete Einträge degradieren zu einem Cache-Miss.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            digest = key_builder(*args, **kwargs) if key_builder else content_hash(args, sorted(kwargs.items()))
+            key = f"{prefix}:{digest}"
+            client = get_redis()
+            
+            try:
+                cached = await client.get(key)
+            except redis.RedisError:
+                cached = None
+            if cached is not None:
+                try:
+                    data = orjson.loads(cached)
+                    return decode(data) if decode else data
+                except Exception:
+                    # Altes Format oder korrupt: verwerfen und neu berechnen
+                    try:
+                        await client.delete(key)
+                    except redis.RedisError:
+                        pass
+            
+            result = await func(self, *args, **kwargs)
+            if result is not None:
+                try:
+                    await client.set(key, orjson.dumps(result), ex=ttl)
+                except redis.RedisError:
+                    pass
+            return result
+        return wrapper
+    return decorator
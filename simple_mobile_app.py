@@ -327,19 +327,43 @@ async def mobile_app():
 
     <script>
         let currentImage = null;
+        let previewUrl = null;
+        
+        // Handyfotos (3-10 MB) vor dem Upload auf max. 1024px längste Kante verkleinern
+        const MAX_EDGE = 1024;
+        const JPEG_QUALITY = 0.85;
+        
+        async function downscaleImage(file) {
+            const bitmap = await createImageBitmap(file);
+            const scale = Math.min(1, MAX_EDGE / Math.max(bitmap.width, bitmap.height));
+            const canvas = document.createElement('canvas');
+            canvas.width = Math.round(bitmap.width * scale);
+            canvas.height = Math.round(bitmap.height * scale);
+            canvas.getContext('2d').drawImage(bitmap, 0, 0, canvas.width, canvas.height);
+            bitmap.close();
+            const blob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', JPEG_QUALITY));
+            // Fallback: Original (mit eigenem Namen und Typ, z.B. HEIC/PNG) hochladen,
+            // falls der Browser nicht encodieren kann oder das JPEG größer wäre
+            if (!blob || blob.size >= file.size) return file;
+            const baseName = file.name.replace(/[.][^.]*$/, '') || 'photo';
+            return new File([blob], baseName + '.jpg', { type: 'image/jpeg' });
+        }
         
         // File input handler
-        document.getElementById('fileInput').addEventListener('change', function(e) {
+        document.getElementById('fileInput').addEventListener('change', async function(e) {
             const file = e.target.files[0];
             if (file) {
-                const reader = new FileReader();
-                reader.onload = function(e) {
+                try {
+                    currentImage = await downscaleImage(file);
+                } catch (err) {
                     currentImage = file;
-                    document.getElementById('previewImage').src = e.target.result;
-                    document.getElementById('preview').style.display = 'block';
-                    document.getElementById('analyzeBtn').disabled = false;
-                };
-                reader.readAsDataURL(file);
+                }
+                // Object URL statt Base64-Data-URL: kein zweites Vollbild im Speicher
+                if (previewUrl) URL.revokeObjectURL(previewUrl);
+                previewUrl = URL.createObjectURL(currentImage);
+                document.getElementById('previewImage').src = previewUrl;
+                document.getElementById('preview').style.display = 'block';
+                document.getElementById('analyzeBtn').disabled = false;
             }
         });
         
@@ -0,0 +1,158 @@
+"""
+🧪 architecture.py: research_market End-to-End, AddItems-Batcher, Redis Response Cache
+"""
+
+import asyncio
+
+import pytest
+
+import redis_cache
+from architecture import EbayAPIClient, EbayAutomationEngine, ProductAnalysis, ProductCategory
+from redis_cache import content_hash, redis_cached
+
+class InMemoryRedis:
+    """Minimaler Ersatz für den Response-Cache-Client (get/set mit TTL ignoriert)"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    async def delete(self, key):
+        self.store.pop(key, None)
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = InMemoryRedis()
+    monkeypatch.setattr(redis_cache, "get_redis", lambda: client)
+    return client
+
+@pytest.fixture
+def product():
+    return ProductAnalysis(
+        brand="Beyerdynamic",
+        model="TG V50d",
+        category=ProductCategory.INSTRUMENTS,
+        condition="Sehr gut",
+        key_features=["Dynamic Microphone", "Cardioid", "XLR"],
+        confidence_score=0.95
+    )
+
+@pytest.mark.asyncio
+async def test_research_market_aggregates_prices(monkeypatch, fake_redis, product):
+    engine = EbayAutomationEngine()
+    researcher = type(engine.market_researcher)
+
+    async def prices(self, product):
+        return {"a": 10.0, "b": 20.0, "c": 30.0, "d": 40.0, "e": 50.0}
+
+    async def competitors(self, product):
+        return {"competitor_count": 7, "optimal_timing": "Sonntagabend"}
+
+    monkeypatch.setattr(researcher, "get_ebay_prices", prices)
+    monkeypatch.setattr(researcher, "get_competitor_analysis", competitors)
+
+    market = await engine.research_market(product)
+
+    assert market.average_price == pytest.approx(30.0)
+    assert market.price_range == (pytest.approx(20.0), pytest.approx(40.0))
+    assert market.competitor_count == 7
+    assert market.optimal_timing == "Sonntagabend"
+    assert market.trending_keywords == ["Beyerdynamic", "TG V50d", "Dynamic Microphone", "Cardioid", "XLR"]
+
+@pytest.mark.asyncio
+async def test_research_market_without_api_data(fake_redis, product):
+    """Stubs liefern noch None → leere Marktdaten statt AttributeError/Crash"""
+    market = await EbayAutomationEngine().research_market(product)
+
+    assert market.average_price == 0.0
+    assert market.price_range == (0.0, 0.0)
+    assert market.competitor_count == 0
+    assert "Beyerdynamic" in market.trending_keywords
+
+# ⚡ Redis Response Cache
+
+class CachedLookup:
+    def __init__(self):
+        self.calls = []
+
+    @redis_cached(prefix="test")
+    async def lookup(self, value):
+        self.calls.append(value)
+        return {"value": value}
+
+def test_content_hash_is_canonical():
+    assert content_hash({"a": 1, "b": 2}) == content_hash({"b": 2, "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+@pytest.mark.asyncio
+async def test_redis_cached_hit_skips_call(fake_redis):
+    service = CachedLookup()
+    assert await service.lookup(1) == {"value": 1}
+    assert await service.lookup(1) == {"value": 1}
+    assert service.calls == [1]
+
+@pytest.mark.asyncio
+async def test_redis_cached_corrupt_entry_is_a_miss(fake_redis):
+    key = f"test:{content_hash((1,), [])}"
+    fake_redis.store[key] = b"{not json"
+
+    service = CachedLookup()
+    assert await service.lookup(1) == {"value": 1}
+    assert service.calls == [1]
+    assert fake_redis.store[key] == b'{"value":1}'
+
+# 🔄 AddItems-Batcher
+
+@pytest.mark.asyncio
+async def test_batcher_coalesces_calls_into_one_batch():
+    client = EbayAPIClient()
+    batches = []
+
+    async def add_items(listings, images):
+        batches.append(listings)
+        return [f"item-{listing}" for listing in listings]
+
+    client.create_listings_batch_async = add_items
+    item_ids = await asyncio.gather(*(client.create_listing_async(i, []) for i in range(3)))
+
+    assert item_ids == ["item-0", "item-1", "item-2"]
+    assert batches == [[0, 1, 2]]
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_batcher_fails_listings_without_returned_id():
+    client = EbayAPIClient()
+
+    async def add_items(listings, images):
+        return ["item-0"]
+
+    client.create_listings_batch_async = add_items
+    results = await asyncio.gather(
+        *(client.create_listing_async(i, []) for i in range(3)),
+        return_exceptions=True
+    )
+
+    assert results[0] == "item-0"
+    assert all(isinstance(r, RuntimeError) for r in results[1:])
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_batcher_close_fails_pending_callers():
+    client = EbayAPIClient()
+
+    async def add_items(listings, images):
+        await asyncio.sleep(60)
+
+    client.create_listings_batch_async = add_items
+    pending = [asyncio.create_task(client.create_listing_async(i, [])) for i in range(7)]
+    await asyncio.sleep(client.BATCH_WINDOW_SECONDS + 0.1)
+
+    await client.close()
+    results = await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), timeout=1)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,72 @@
+"""
+🧪 main.py: Redis Job Store und Upload-Limits
+"""
+
+import io
+
+import pytest
+from fakeredis import aioredis as fake_aioredis
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+import main
+from architecture import ListingStatus
+
+@pytest.fixture
+def job_redis(monkeypatch):
+    client = fake_aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(main, "redis_client", client)
+    return client
+
+# 📦 Redis Job Store
+
+@pytest.mark.asyncio
+async def test_save_and_load_job_roundtrip(job_redis):
+    job = main.ProcessingJob("job1")
+    job.status = ListingStatus.RESEARCHING
+    job.progress = 50
+    job.result = {"listing": {"title": "Mikrofon"}}
+    await main.save_job(job)
+
+    loaded = await main.load_job("job1")
+
+    assert loaded.status == ListingStatus.RESEARCHING
+    assert loaded.progress == 50
+    assert loaded.result == {"listing": {"title": "Mikrofon"}}
+    assert loaded.created_at == job.created_at
+    assert 0 < await job_redis.ttl(main.job_key("job1")) <= main.JOB_TTL_SECONDS
+
+@pytest.mark.asyncio
+async def test_processing_time_counts_from_job_creation(job_redis):
+    job = main.ProcessingJob("job2")
+    job.started_at -= 5
+    await main.save_job(job)
+
+    # Neu geladen (z.B. in einem anderen Worker): Laufzeit läuft ab Erstellung weiter
+    loaded = await main.load_job("job2")
+
+    assert loaded.elapsed_ms() >= 5000
+
+@pytest.mark.asyncio
+async def test_load_unknown_job_is_404(job_redis):
+    with pytest.raises(HTTPException) as exc_info:
+        await main.load_job("missing")
+    assert exc_info.value.status_code == 404
+
+# 📸 Upload-Limits
+
+@pytest.mark.asyncio
+async def test_oversized_upload_is_rejected_with_413():
+    upload = UploadFile(file=io.BytesIO(b"\0" * (main.MAX_UPLOAD_SIZE + 1)), filename="big.jpg")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await main.read_upload_for_vision(upload)
+    assert exc_info.value.status_code == 413
+
+@pytest.mark.asyncio
+async def test_non_image_upload_is_rejected_with_400():
+    upload = UploadFile(file=io.BytesIO(b"kein Bild"), filename="notes.jpg")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await main.read_upload_for_vision(upload)
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,120 @@
+"""
+🧪 main_complete.py: Listing-Quota (reserve/release) und Upload-Size-Middleware
+"""
+
+import enum
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+
+pytest.importorskip("services.vision_service")
+pytest.importorskip("database.models")
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import main_complete as mc
+
+FREE_LIMIT = mc.settings.PLAN_LIMITS[mc.UserPlan.FREE]["monthly_listings"]
+
+def required_column_values(table) -> dict:
+    """Platzhalter für NOT-NULL-Spalten ohne Default (nur für die Test-Row)"""
+    placeholders = {bool: False, int: 0, float: 0.0, str: "test", datetime: datetime(2024, 1, 1), date: date(2024, 1, 1)}
+    values = {}
+    for column in table.columns:
+        if column.nullable or column.primary_key or column.default is not None or column.server_default is not None:
+            continue
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = str
+        if issubclass(python_type, enum.Enum):
+            values[column.name] = next(iter(python_type))
+        else:
+            values[column.name] = placeholders.get(python_type, f"test-{column.name}")
+    return values
+
+@pytest_asyncio.fixture
+async def quota_db():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    users = mc.User.__table__
+    async with engine.begin() as conn:
+        await conn.run_sync(users.create)
+        await conn.execute(insert(users).values({
+            **required_column_values(users),
+            "id": 1,
+            "plan": mc.UserPlan.FREE,
+            "monthly_listings_used": FREE_LIMIT - 1
+        }))
+    async with AsyncSession(engine) as session:
+        yield session
+    await engine.dispose()
+
+async def listings_used(db: AsyncSession) -> int:
+    return await db.scalar(select(mc.User.monthly_listings_used).where(mc.User.id == 1))
+
+# 📊 Quota
+
+@pytest.mark.asyncio
+async def test_reserve_stops_at_plan_limit(quota_db):
+    user = SimpleNamespace(id=1, plan=mc.UserPlan.FREE)
+
+    assert await mc.reserve_listing_quota(quota_db, user) is True
+    assert await mc.reserve_listing_quota(quota_db, user) is False
+    await quota_db.commit()
+
+    assert await listings_used(quota_db) == FREE_LIMIT
+
+@pytest.mark.asyncio
+async def test_release_gives_reservation_back_but_not_below_zero(quota_db):
+    user = SimpleNamespace(id=1, plan=mc.UserPlan.FREE)
+
+    assert await mc.reserve_listing_quota(quota_db, user) is True
+    await mc.release_listing_quota(quota_db, user)
+    await quota_db.commit()
+    assert await listings_used(quota_db) == FREE_LIMIT - 1
+
+    for _ in range(FREE_LIMIT + 1):
+        await mc.release_listing_quota(quota_db, user)
+    await quota_db.commit()
+    assert await listings_used(quota_db) == 0
+
+# 📸 Upload-Size-Middleware
+
+async def call_middleware(path: str, content_length: int):
+    app_calls = []
+    sent = []
+
+    async def downstream(scope, receive, send):
+        app_calls.append(scope["path"])
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = mc.UploadSizeLimitMiddleware(downstream, path="/analyze-product", max_body_size=100)
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": [(b"content-length", str(content_length).encode())]
+    }
+    await middleware(scope, receive, send)
+    return app_calls, sent
+
+@pytest.mark.asyncio
+async def test_oversized_upload_rejected_before_the_app():
+    app_calls, sent = await call_middleware("/analyze-product", 101)
+
+    assert app_calls == []
+    assert sent[0]["status"] == 413
+
+@pytest.mark.asyncio
+async def test_other_paths_and_small_uploads_pass_through():
+    assert (await call_middleware("/analyze-product", 100))[0] == ["/analyze-product"]
+    assert (await call_middleware("/generate-content", 10_000))[0] == ["/generate-content"]
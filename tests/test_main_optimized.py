@@ -0,0 +1,74 @@
+"""
+🧪 main_optimized.py: ETag/304 beim Status-Polling
+"""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("services.vision_service")
+pytest.importorskip("database.connection")
+pytest.importorskip("cache.redis_manager")
+
+from starlette.requests import Request
+
+import main_optimized as mo
+
+class FakeStatusDB:
+    """Liefert immer dieselbe Job-Row (nur die Status-Spalten)"""
+
+    def __init__(self, job):
+        self.job = job
+
+    async def scalar(self, statement):
+        return self.job
+
+def status_request(job_id: str, if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": f"/api/status/{job_id}",
+        "headers": headers,
+        "query_string": b""
+    })
+
+@pytest.fixture
+def running_job(monkeypatch):
+    async def no_live_progress(job_id):
+        return None
+
+    monkeypatch.setattr(mo, "load_job_progress", no_live_progress)
+    return SimpleNamespace(
+        status="processing",
+        progress=50,
+        message="Analysiere Bild...",
+        error=None,
+        created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        completed_at=None
+    )
+
+@pytest.mark.asyncio
+async def test_unchanged_status_poll_returns_304(running_job):
+    db = FakeStatusDB(running_job)
+
+    first = await mo.get_job_status("job1", status_request("job1"), db)
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+
+    second = await mo.get_job_status("job1", status_request("job1", etag), db)
+    assert second.status_code == 304
+    assert second.body == b""
+    assert second.headers["etag"] == etag
+
+@pytest.mark.asyncio
+async def test_progress_change_invalidates_etag(running_job):
+    db = FakeStatusDB(running_job)
+    etag = (await mo.get_job_status("job1", status_request("job1"), db)).headers["etag"]
+
+    running_job.progress = 75
+    response = await mo.get_job_status("job1", status_request("job1", etag), db)
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag